@@ -1,6 +1,14 @@
+import os
+import re
 from setuptools import setup
+
+#the version is only written in vicon/__init__.py (the clip cache
+#keys depend on it)
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)),'vicon','__init__.py')) as f:
+    version=re.search(r"^__version__='([^']+)'",f.read(),re.M).group(1)
+
 setup(name='vicon',
-version='0.25',
+version=version,
 description='Package for VICON Motion Capture data analysis',
 url='https://github.com/artvalencio/vicon',
 author='Arthur Valencio, IC-Unicamp, RIDC NeuroMat',
@@ -12,6 +20,6 @@ classifiers=[
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-python_requires='>=3.6',
+python_requires='>=3.7',
 install_requires=['pandas','numpy','matplotlib'],
 zip_safe=False)
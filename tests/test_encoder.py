@@ -0,0 +1,72 @@
+import re
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+import vicon
+from vicon.gen_detector_intro import _detector_levels
+
+requires_ffmpeg=pytest.mark.skipif(shutil.which('ffmpeg') is None,reason='requires ffmpeg')
+
+def _decode(filename,indexes=None):
+    #decoded rgb24 frames, their frame numbers (from their timestamps)
+    #and the duration of the video; indexes selects the frames decoded
+    size=subprocess.run(['ffmpeg','-i',str(filename)],capture_output=True,text=True).stderr
+    width,height=map(int,re.search(r'yuv420p[^,]*, (\d+)x(\d+)',size).groups())
+    filters='showinfo'
+    if indexes is not None:
+        filters="select='"+'+'.join('eq(n\\,'+str(i)+')' for i in indexes)+"',"+filters
+    out=subprocess.run(['ffmpeg','-i',str(filename),'-vf',filters,'-fps_mode','passthrough',
+                        '-f','rawvideo','-pix_fmt','rgb24','-'],capture_output=True)
+    log=out.stderr.decode()
+    frames=np.frombuffer(out.stdout,np.uint8).reshape(-1,height,width,3)
+    numbers=[round(float(t)*30) for t in re.findall(r'pts_time:(\S+)',log)]
+    hours,minutes,seconds=re.search(r'Duration: (\d+):(\d+):([\d.]+)',log).groups()
+    return frames,numbers,int(hours)*3600+int(minutes)*60+float(seconds)
+
+@requires_ffmpeg
+def test_dedupe_timestamps(tmp_path):
+    #runs of 3 black, 1 grey and 5 white frames
+    levels=[0]*3+[128]+[255]*5
+    filename=tmp_path/'runs.mp4'
+    with vicon.VideoEncoder(filename,fps=30,preset='ultrafast',dedupe=True) as encoder:
+        for level in levels:
+            encoder.write(np.full((48,64,3),level,dtype=np.uint8))
+    assert encoder.numframes==9
+    assert encoder.duplicates==6
+    frames,numbers,duration=_decode(filename)
+    #(the last frame is sent again at the end)
+    assert numbers==[0,3,4,8]
+    assert duration==pytest.approx(0.3)
+    for frame,number in zip(frames,numbers):
+        assert np.abs(frame.astype(int)-levels[number]).max()<=2
+
+@requires_ffmpeg
+@pytest.mark.parametrize('clip',['rest','intro'])
+def test_dedupe_pixels(tmp_path,clip):
+    #a deduped clip shows the same frames, at the same times, as the
+    #constant frame rate clip (with the default bitrate)
+    if clip=='rest':
+        render=lambda filename,encoder: vicon.central_dot(filename,3,detector=0.3,encoder=encoder)
+        levels=[0.3]*90
+    else:
+        render=lambda filename,encoder: vicon.gen_detector_intro(filename,15,encoder=encoder)
+        levels=_detector_levels(450)
+    starts=[i for i in range(len(levels)) if i==0 or levels[i]!=levels[i-1]]+[len(levels)-1]
+    render(str(tmp_path/'cfr.mp4'),None)
+    render(str(tmp_path/'vfr.mp4'),{'dedupe':True})
+    frames,numbers,duration=_decode(tmp_path/'vfr.mp4')
+    expected,_,expected_duration=_decode(tmp_path/'cfr.mp4',starts)
+    assert numbers==starts
+    assert duration==pytest.approx(expected_duration)
+    assert np.abs(frames.astype(int)-expected.astype(int)).max()<=32
+
+@pytest.mark.parametrize('key',['fps','filename_out'])
+def test_encoder_options_arguments(tmp_path,key):
+    #options given by the renderer arguments are rejected by name
+    #(before ffmpeg is started)
+    with pytest.raises(ValueError,match=key):
+        vicon.central_dot(str(tmp_path/'rest.mp4'),1,encoder={key:25})
+    assert not (tmp_path/'rest.mp4').exists()
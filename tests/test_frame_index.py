@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+
+import vicon
+
+def _write_csv(filename,xyz):
+    #preprocessed CSV file (X, Y and Z columns of each marker), with
+    #lines of different lengths
+    nmarkers=xyz.shape[1]
+    suffixes=['']+['.'+str(k) for k in range(1,nmarkers)]
+    columns=[axis+k for axis in ('X','Y','Z') for k in suffixes]
+    values=np.concatenate([xyz[:,:,0],xyz[:,:,1],xyz[:,:,2]],axis=1)
+    with open(filename,'w',newline='') as f:
+        f.write(','.join(columns)+'\n')
+        for row in values:
+            f.write(','.join(repr(float(v)) for v in row)+'\n')
+
+def _line_starts(filename):
+    with open(filename,'rb') as f:
+        lines=f.readlines()
+    return np.cumsum([len(line) for line in lines])[:-1],sum(len(line) for line in lines)
+
+def _trajectories(numframes,seed):
+    rng=np.random.default_rng(seed)
+    return np.round(rng.normal(0,5,(numframes,4,3))*10.0**rng.integers(0,5,(numframes,4,3)),2)
+
+def test_frame_index(tmp_path):
+    filename=str(tmp_path/'walk.csv')
+    xyz=_trajectories(300,0)
+    _write_csv(filename,xyz)
+    offsets=vicon.frame_index(filename)
+    starts,size=_line_starts(filename)
+    np.testing.assert_array_equal(offsets,np.append(starts,size))
+    assert os.path.exists(filename+'.idx')
+    window,header=vicon.read_frames(filename,[120,170])
+    assert header['numframes']==300
+    np.testing.assert_array_equal(window,xyz[120:170])
+
+def test_saved_index_reused(tmp_path):
+    #an index matching the size and time of the file is not rebuilt
+    filename=str(tmp_path/'walk.csv')
+    _write_csv(filename,_trajectories(50,0))
+    offsets=vicon.frame_index(filename)
+    stat=os.stat(filename)
+    with open(filename+'.idx','wb') as f:
+        np.savez(f,offsets=offsets[::2],size=stat.st_size,mtime=stat.st_mtime_ns)
+    np.testing.assert_array_equal(vicon.frame_index(filename),offsets[::2])
+    np.testing.assert_array_equal(vicon.frame_index(filename,rebuild=True),offsets)
+
+def test_stale_index_size(tmp_path):
+    #a file that grew is indexed again
+    filename=str(tmp_path/'walk.csv')
+    _write_csv(filename,_trajectories(100,0))
+    vicon.frame_index(filename)
+    xyz=_trajectories(180,1)
+    _write_csv(filename,xyz)
+    offsets=vicon.frame_index(filename)
+    assert len(offsets)==181
+    np.testing.assert_array_equal(vicon.read_frames(filename,[150,180])[0],xyz[150:180])
+
+def test_stale_index_mtime(tmp_path):
+    #a file of the same size, with other lines, is indexed again when
+    #its modification time changes
+    filename=str(tmp_path/'walk.csv')
+    xyz=_trajectories(100,0)
+    _write_csv(filename,xyz)
+    old=vicon.frame_index(filename)
+    stat=os.stat(filename)
+    with open(filename,'rb') as f:
+        header=f.readline()
+        lines=f.readlines()
+    order=np.argsort([len(line) for line in lines],kind='stable')
+    with open(filename,'wb') as f:
+        f.write(header+b''.join(lines[k] for k in order))
+    os.utime(filename,ns=(stat.st_atime_ns,stat.st_mtime_ns+10**9))
+    assert os.path.getsize(filename)==stat.st_size
+    offsets=vicon.frame_index(filename)
+    assert not np.array_equal(offsets,old)
+    np.testing.assert_array_equal(offsets,np.append(*_line_starts(filename)))
+    np.testing.assert_array_equal(vicon.read_frames(filename)[0],xyz[order])
+
+def test_unreadable_index(tmp_path):
+    #a damaged index is replaced
+    filename=str(tmp_path/'walk.csv')
+    _write_csv(filename,_trajectories(40,0))
+    with open(filename+'.idx','wb') as f:
+        f.write(b'not an index')
+    offsets=vicon.frame_index(filename)
+    assert len(offsets)==41
+    with np.load(filename+'.idx') as saved:
+        np.testing.assert_array_equal(saved['offsets'],offsets)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+import vicon
+from vicon.gapfill import _GapFiller
+
+def _gaps(numframes,nmarkers,seed):
+    #smooth trajectories with gaps of random lengths (some longer than
+    #max_gap, at the start and at the end, or close to each other)
+    rng=np.random.default_rng(seed)
+    t=np.arange(numframes)[:,None,None]
+    xyz=100*np.sin(t/rng.uniform(5,30,(1,nmarkers,3))+rng.uniform(0,6,(1,nmarkers,3)))
+    for _ in range(numframes//4):
+        marker=rng.integers(nmarkers)
+        start=rng.integers(-3,numframes)
+        length=rng.choice([1,2,3,5,8,12,13,20])
+        xyz[max(start,0):start+length,marker,rng.integers(3)]=rng.choice([np.nan,np.inf])
+    return xyz
+
+def _chunked(xyz,chunks,max_gap,method):
+    filler=_GapFiller(xyz.shape[1],max_gap,method)
+    filled,unfilled=[],[]
+    bounds=np.concatenate(([0],chunks,[len(xyz)]))
+    for start,end in zip(bounds[:-1],bounds[1:]):
+        result=filler.fill(xyz[start:end])
+        filled.append(result[0])
+        unfilled.append(result[1])
+    result=filler.fill(np.zeros((0,)+xyz.shape[1:]),last=True)
+    return np.concatenate(filled+[result[0]]),np.concatenate(unfilled+[result[1]])
+
+@pytest.mark.parametrize('method',['linear','cubic'])
+@pytest.mark.parametrize('max_gap',[0,1,3,12])
+@pytest.mark.parametrize('seed',range(4))
+def test_chunks_match_whole(seed,max_gap,method):
+    xyz=_gaps(300,5,seed)
+    expected,expected_unfilled=vicon.fill_gaps(xyz,max_gap,method)
+    rng=np.random.default_rng(seed)
+    for size in (1,2,max_gap+2,max_gap+3,7,None):
+        if size is None:
+            #(random chunk sizes)
+            chunks=np.sort(rng.choice(np.arange(1,300),20,replace=False))
+        else:
+            chunks=np.arange(size,300,size)
+        filled,unfilled=_chunked(xyz,chunks,max_gap,method)
+        np.testing.assert_array_equal(filled,expected)
+        np.testing.assert_array_equal(unfilled,expected_unfilled)
+
+def test_linear_values():
+    xyz=np.zeros((6,1,3))
+    xyz[:,0,0]=[0,np.nan,np.nan,np.nan,8,np.nan]
+    filled,unfilled=vicon.fill_gaps(xyz,max_gap=3)
+    np.testing.assert_array_equal(filled[:5,0,0],[0,2,4,6,8])
+    #(a gap at the end is not filled)
+    assert np.isnan(filled[5,0]).all()
+    np.testing.assert_array_equal(unfilled[:,0],[False]*5+[True])
+    filled,unfilled=vicon.fill_gaps(xyz,max_gap=2)
+    assert unfilled[1:4,0].all()
+
+def test_max_gap_none():
+    with pytest.raises(ValueError):
+        _GapFiller(20,None)
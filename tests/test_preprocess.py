@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+import vicon
+from vicon.benchmark import synthetic_capture
+
+@pytest.fixture(scope='module')
+def capture(tmp_path_factory):
+    #a walk of 50 s, turning more than once around the room (so the
+    #shoulder angle goes through all quadrants), with gaps
+    filename=str(tmp_path_factory.mktemp('capture')/'capture.csv')
+    xyz=synthetic_capture(filename,numframes=1500,rate=30,seed=3,gaps=20)
+    return filename,xyz
+
+@pytest.mark.parametrize('chunksize',[13,97,1500,5000])
+def test_read_vicon_chunks(capture,chunksize):
+    filename,xyz=capture
+    header,chunks=vicon.read_vicon(filename,chunksize=chunksize)
+    chunks=list(chunks)
+    assert header['rate']==30
+    assert header['markers']==['Subject:M'+str(m) for m in range(20)]
+    assert all(len(chunk)==chunksize for chunk in chunks[:-1])
+    np.testing.assert_allclose(np.concatenate(chunks),xyz,rtol=0,atol=1e-5)
+
+@pytest.mark.parametrize('center',['shoulder','mean',None])
+def test_preprocess_chunks(capture,center):
+    #the result does not depend on where the chunks are split
+    filename,xyz=capture
+    quiet=lambda status: None
+    whole=vicon.preprocess(filename,None,center=center,chunksize=5000,progress=quiet)
+    assert whole['frames']==1500
+    for chunksize in (13,97,499):
+        chunked=vicon.preprocess(filename,None,center=center,chunksize=chunksize,progress=quiet)
+        np.testing.assert_array_equal(np.asarray(chunked['trajectory'].xyz),
+                                      np.asarray(whole['trajectory'].xyz))
+    if center=='shoulder':
+        #(the chunks are split in all quadrants of the shoulder angle)
+        theta=vicon.rotation_angle(xyz-xyz[:,4:5])
+        assert (theta<0).any() and (theta>np.pi/2).any()
+
+def test_preprocess_csv(capture,tmp_path):
+    #the CSV output of a chunked run is read back as the same frames
+    filename,_=capture
+    quiet=lambda status: None
+    whole=vicon.preprocess(filename,None,center='shoulder',progress=quiet)
+    out=str(tmp_path/'out.csv')
+    vicon.preprocess(filename,out,center='shoulder',chunksize=97,progress=quiet)
+    xyz,_=vicon.read_frames(out)
+    np.testing.assert_allclose(xyz,np.asarray(whole['trajectory'].xyz),rtol=1e-6,atol=1e-3)
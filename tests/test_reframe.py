@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from vicon.reframe import reframe,rotation_angle
+
+def _loop_theta(xyz,prev_theta=None):
+    #rotation angles computed frame by frame, as in the first
+    #versions of vicon.preprocess
+    theta=np.zeros(len(xyz))
+    for i in range(len(xyz)):
+        x6,y6=xyz[i,6,0],xyz[i,6,1]
+        if np.absolute(y6)<10:
+            theta[i]=np.pi/2
+        else:
+            theta[i]=np.arctan(-x6/y6) #1st and 4th quadrant
+        prev=theta[i-1] if i>0 else prev_theta
+        if prev is not None:
+            if (theta[i]<=0 and prev>=0) and prev<np.pi: #2nd quadrant
+                theta[i]=np.pi-np.absolute(theta[i])
+            elif theta[i]>0 and (prev>=3 and theta[i]<=1.6): #3rd quadrant
+                theta[i]=np.pi+theta[i]
+    return theta
+
+def _loop_reframe(xyz,center):
+    xyz=np.array(xyz,dtype=float)
+    for i in range(len(xyz)):
+        if center=='shoulder':
+            xyz[i]-=xyz[i,4]
+        elif center=='mean':
+            xyz[i]-=np.nanmean(xyz[i],axis=0)
+    if center=='shoulder':
+        theta=_loop_theta(xyz)
+        for i in range(len(xyz)):
+            x,y=xyz[i,:,0].copy(),xyz[i,:,1].copy()
+            xyz[i,:,0]=x*np.cos(-theta[i])-y*np.sin(-theta[i])
+            xyz[i,:,1]=x*np.sin(-theta[i])+y*np.cos(-theta[i])
+    return xyz
+
+def _turning(numframes,seed):
+    #markers around a neck (marker 4) moving in the room, with the
+    #shoulder (marker 6) turning through all quadrants, with jumps
+    #and frames where it is aligned with the x-axis
+    rng=np.random.default_rng(seed)
+    steps=rng.normal(0,0.4,numframes)
+    jumps=rng.random(numframes)<0.05
+    steps[jumps]=rng.uniform(-np.pi,np.pi,jumps.sum())
+    angle=np.cumsum(steps)
+    xyz=rng.normal(0,300,(numframes,20,3))
+    xyz[:,4]=rng.normal(0,2000,(numframes,3))
+    radius=rng.uniform(100,200,numframes)
+    xyz[:,6,0]=xyz[:,4,0]+radius*np.cos(angle)
+    xyz[:,6,1]=xyz[:,4,1]+radius*np.sin(angle)
+    aligned=rng.random(numframes)<0.05
+    xyz[aligned,6,1]=xyz[aligned,4,1]+rng.uniform(-9,9,aligned.sum())
+    return xyz
+
+@pytest.mark.parametrize('seed',range(5))
+def test_rotation_angle_matches_loop(seed):
+    xyz=_turning(2000,seed)
+    xyz=xyz-xyz[:,4:5]
+    np.testing.assert_allclose(rotation_angle(xyz),_loop_theta(xyz),rtol=0,atol=1e-12)
+    np.testing.assert_allclose(rotation_angle(xyz,prev_theta=3.5),_loop_theta(xyz,3.5),
+                               rtol=0,atol=1e-12)
+
+@pytest.mark.parametrize('center',['shoulder','mean',None])
+def test_reframe_matches_loop(center):
+    xyz=_turning(500,10)
+    #(an occluded marker in some frames)
+    xyz[np.random.default_rng(1).random(500)<0.1,3]=np.nan
+    np.testing.assert_allclose(reframe(xyz,center),_loop_reframe(xyz,center),rtol=1e-9,
+                               atol=1e-6)
+
+@pytest.mark.parametrize('seed',range(5))
+def test_reframe_chunks(seed):
+    #chunks continued with prev_theta give the same result as the
+    #whole array, wherever the chunks are split
+    xyz=_turning(1500,seed)
+    rng=np.random.default_rng(seed)
+    bounds=np.concatenate(([0],np.sort(rng.choice(np.arange(1,1500),8,replace=False)),[1500]))
+    chunks=[]
+    theta=None
+    for start,end in zip(bounds[:-1],bounds[1:]):
+        chunk,theta=reframe(xyz[start:end],'shoulder',prev_theta=theta,return_theta=True)
+        chunks.append(chunk)
+    whole,last=reframe(xyz,'shoulder',return_theta=True)
+    np.testing.assert_array_equal(np.concatenate(chunks),whole)
+    assert theta==last
@@ -0,0 +1,65 @@
+import importlib
+
+import numpy as np
+import pytest
+
+import vicon
+
+class _Frames(vicon.VideoEncoder):
+    #encoder keeping the frames in memory (no ffmpeg)
+    def __init__(self,fps=30):
+        super().__init__(None,fps=fps)
+        self.frames=[]
+
+    def write(self,frame):
+        self.frames.append(np.array(frame)[:,:,:3])
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def walk():
+    #a walk far from the origin, so that the axis limits of the data
+    #before and after centering differ
+    rng=np.random.default_rng(0)
+    xyz=rng.normal(0,300,(1,20,3))+rng.normal(0,20,(8,20,3))+[2500,-1500,900]
+    return vicon.Trajectory(xyz,rate=30)
+
+@pytest.fixture
+def batch(monkeypatch):
+    #frames drawn by render_batch (the jobs are drawn here, not encoded)
+    module=importlib.import_module('vicon.render_batch')
+    drawn={}
+    def job(job):
+        points,edges,filename_out,fps,encoder,backend,patch,detector=job[0]
+        drawn[filename_out]=[np.array(frame)[:,:,:3] for frame in
+                             vicon.rasterize(points,edges,patch=patch,patch_level=detector)]
+        return []
+    monkeypatch.setattr(module,'_render_job',job)
+    return drawn
+
+@pytest.mark.parametrize('axislims',[None,(800,800,1200)])
+def test_scrambled_views_match(walk,batch,axislims):
+    single=_Frames()
+    vicon.scrambled_video(walk,None,scrambletype='constrained',seed=5,detector=1,
+                          axislims=axislims,backend='raster',encoder=single)
+    vicon.render_batch(walk,[{'filename_out':'scrambled','scrambletype':'constrained','seed':5,
+                              'detector':1}],axislims=axislims,processes=1)
+    playback=vicon.Playback(walk,scrambletype='constrained',seed=5,detector=1,
+                            axislims=axislims,realtime=False)
+    played=[np.array(frame) for frame in playback]
+    assert len(single.frames)==8
+    np.testing.assert_array_equal(batch['scrambled'],single.frames)
+    np.testing.assert_array_equal(played,single.frames)
+
+@pytest.mark.parametrize('axislims',[None,(800,800,1200)])
+def test_original_views_match(walk,batch,axislims):
+    single=_Frames()
+    vicon.make_video(walk,None,azimuth_angle=30,axislims=axislims,backend='raster',
+                     encoder=single)
+    vicon.render_batch(walk,[{'filename_out':'original','azimuth_angle':30}],
+                       axislims=axislims,processes=1)
+    playback=vicon.Playback(walk,azimuth_angle=30,axislims=axislims,realtime=False)
+    played=[np.array(frame) for frame in playback]
+    np.testing.assert_array_equal(batch['original'],single.frames)
+    np.testing.assert_array_equal(played,single.frames)
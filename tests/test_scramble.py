@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from vicon.scramble import scramble,_PAIRS
+
+@pytest.fixture(scope='module')
+def xyz():
+    #centered trajectories of 20 markers, each moving around its
+    #own (distinct) position
+    rng=np.random.default_rng(0)
+    xyz=rng.normal(0,400,(1,20,3))+rng.normal(0,30,(200,20,3))
+    return xyz-np.nanmean(xyz,axis=(0,1))
+
+def _orders(xyz,scrambled):
+    #pair moved into each pair slot, found from the marker whose
+    #centroid each scrambled marker took
+    centroid=xyz.mean(axis=0)
+    moved=scrambled.mean(axis=1)
+    distance=np.linalg.norm(moved[:,:,None]-centroid[None,None],axis=3)
+    target=distance.argmin(axis=2)
+    pair_of=np.empty(20,dtype=int)
+    pair_of[np.array(_PAIRS)]=np.arange(len(_PAIRS))[:,None]
+    pairs=np.array(_PAIRS)
+    #(each marker takes the place of a marker of the same pair)
+    assert (pair_of[target[:,pairs[:,0]]]==pair_of[target[:,pairs[:,1]]]).all()
+    np.testing.assert_array_equal(target[:,pairs[:,0]],pairs[pair_of[target[:,pairs[:,0]]],1])
+    return pair_of[target[:,pairs[:,0]]]
+
+@pytest.mark.parametrize('seed',range(10))
+def test_pairwise_constraints(xyz,seed):
+    scrambled=scramble(xyz,'pairwise',seed=seed,size=50)
+    orders=_orders(xyz,scrambled)
+    assert (np.sort(orders,axis=1)==np.arange(len(_PAIRS))).all()
+    #no arm pair in the arm slots, no leg pair in the leg slots
+    assert (orders[:,:4]>=4).all()
+    assert ((orders[:,4:8]<4)|(orders[:,4:8]>=8)).all()
+    #(the offsets are constant over the frames)
+    offsets=scrambled-xyz[None]
+    np.testing.assert_allclose(offsets,np.broadcast_to(offsets[:,:1],offsets.shape),atol=1e-9)
+
+def test_pairwise_single(xyz):
+    orders=_orders(xyz,scramble(xyz,'pairwise',seed=3)[None])
+    assert (orders[0,:4]>=4).all() and ((orders[0,4:8]<4)|(orders[0,4:8]>=8)).all()
+
+@pytest.mark.parametrize('scrambletype',['pairwise','constrained','scrambled'])
+def test_seeded(xyz,scrambletype):
+    np.testing.assert_array_equal(scramble(xyz,scrambletype,seed=7),
+                                  scramble(xyz,scrambletype,seed=7))
+    assert not np.array_equal(scramble(xyz,scrambletype,seed=7),
+                              scramble(xyz,scrambletype,seed=8))
+
+def test_constrained_limits(xyz):
+    scrambled=scramble(xyz,'constrained',seed=1,size=100)
+    lo,hi=xyz.min(axis=(0,1)),xyz.max(axis=(0,1))
+    assert (scrambled>=lo-1e-9).all() and (scrambled<=hi+1e-9).all()
+
+def test_pairwise_markers(xyz):
+    with pytest.raises(ValueError):
+        scramble(xyz[:,:19],'pairwise',seed=0)
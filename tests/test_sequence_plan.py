@@ -0,0 +1,133 @@
+import csv
+import importlib
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import vicon
+
+requires_ffmpeg=pytest.mark.skipif(shutil.which('ffmpeg') is None,reason='requires ffmpeg')
+
+def _walk(numframes,seed):
+    rng=np.random.default_rng(seed)
+    xyz=rng.normal(0,300,(1,20,3))+rng.normal(0,20,(numframes,20,3))
+    return vicon.Trajectory(xyz,rate=30)
+
+@pytest.fixture(scope='module')
+def walk_files(tmp_path_factory):
+    #walks long enough for the trials of vicon.SEQUENCE_SPEC
+    folder=tmp_path_factory.mktemp('walks')
+    names=[]
+    for k in range(3):
+        names.append('walk'+str(k)+'.traj')
+        walk=_walk(1300,k)
+        vicon.save_trajectory(str(folder/names[-1]),walk.xyz,rate=30)
+    return str(folder),names
+
+def _spec(**changes):
+    #a short experiment: one block of two trials, each followed by a rest
+    spec={'seed':1,'blocks':1,'skip':0,'intro':None,'block_rest':None,
+          'trials':[{'name':'biological','function':'make_video','count':2,'seconds':0.3,
+                     'params':{'backend':'raster'}}],
+          'rest':{'function':'central_dot','seconds':0.2,'params':{'detector':0.3}}}
+    spec.update(changes)
+    return spec
+
+def test_plan_walks(walk_files):
+    folder,names=walk_files
+    walks=[os.path.join(folder,name) for name in names]
+    plan=vicon.plan_sequence(dict(vicon.SEQUENCE_SPEC,seed=2),walks)
+    trials=[segment for segment in plan['segments'] if segment['kind']=='trial']
+    assert len(trials)==30
+    #(all walk files are drawn, including the last one)
+    assert sorted(set(segment['walk'] for segment in trials))==[0,1,2]
+    for segment in trials:
+        assert segment['source']==walks[segment['walk']]
+        assert segment['window'][0]>=300 and segment['window'][1]<=1300
+    assert plan==vicon.plan_sequence(dict(vicon.SEQUENCE_SPEC,seed=2),walks)
+    #(a single walk file is enough)
+    plan=vicon.plan_sequence(dict(vicon.SEQUENCE_SPEC,seed=2),walks[:1])
+    assert set(segment['walk'] for segment in plan['segments'] if segment['kind']=='trial')=={0}
+
+def test_plan_changes():
+    #changing a part of the specification keeps the other clips
+    walks=[_walk(200,0),_walk(200,1)]
+    plan=vicon.plan_sequence(_spec(),walks)
+    keys=lambda plan,kind: [s['key'] for s in plan['segments'] if s['kind']==kind]
+    other=vicon.plan_sequence(_spec(rest=dict(_spec()['rest'],seconds=0.4)),walks)
+    assert keys(other,'trial')==keys(plan,'trial')
+    assert set(keys(other,'rest')).isdisjoint(keys(plan,'rest'))
+    trials=[dict(_spec()['trials'][0],count=3)]
+    other=vicon.plan_sequence(_spec(trials=trials),walks)
+    assert set(keys(plan,'trial'))<set(keys(other,'trial'))
+    assert len(set(keys(other,'trial')))==3
+
+def test_create_video_sequence_plan(walk_files,monkeypatch,tmp_path):
+    #create_video_sequence renders and joins the plan of
+    #vicon.SEQUENCE_SPEC (the clips are not rendered here)
+    folder,names=walk_files
+    module=importlib.import_module('vicon.create_video_sequence')
+    rendered={}
+    def render(job):
+        function,kwargs,cache_dir,cache_size,trace=job
+        rendered[kwargs['filename_out']]=(function,kwargs)
+        return []
+    joined=[]
+    monkeypatch.setattr(module,'_render_clip',render)
+    monkeypatch.setattr(importlib.import_module('vicon.assemble'),'assemble',
+                        lambda segments,filename_out,tracer=None: joined.append(segments))
+    events=str(tmp_path/'events.csv')
+    vicon.create_video_sequence(folder,names[:1],'sequence.mp4',processes=1,seed=4,
+                                events=events)
+    plan=vicon.plan_sequence(dict(vicon.SEQUENCE_SPEC,seed=4),[os.path.join(folder,names[0])])
+    assert len(rendered)==len(plan['jobs'])
+    jobs={os.path.splitext(os.path.basename(name))[0]:job for name,job in rendered.items()}
+    for key,(function,kwargs) in plan['jobs'].items():
+        assert jobs[key][0]==function
+        assert {k:v for k,v in jobs[key][1].items() if k!='filename_out'}==kwargs
+    assert [os.path.splitext(os.path.basename(name))[0] for name in joined[0]]==[
+        segment['key'] for segment in plan['segments']]
+    with open(events) as f:
+        rows=list(csv.DictReader(f))
+    assert rows[-1]['onset_frame']==str(sum(s['frames'] for s in plan['segments'])-450)
+
+@requires_ffmpeg
+def test_build_sequence_incremental(tmp_path):
+    walks=[_walk(200,0),_walk(200,1)]
+    build=str(tmp_path/'build')
+    output=str(tmp_path/'sequence.mp4')
+    encoder={'preset':'ultrafast'}
+    first=vicon.build_sequence(_spec(),walks,output,build,processes=1,encoder=encoder)
+    assert (first['rendered'],first['reused'],first['joined'])==(3,0,True)
+    clips={key:os.stat(os.path.join(build,key+'.mp4')).st_mtime_ns
+           for key in first['plan']['jobs']}
+
+    #nothing changed: nothing is rendered or joined
+    again=vicon.build_sequence(_spec(),walks,output,build,processes=1,encoder=encoder)
+    assert (again['rendered'],again['reused'],again['joined'])==(0,3,False)
+
+    #a longer rest: only the rest is rendered again
+    spec=_spec(rest=dict(_spec()['rest'],seconds=0.4))
+    changed=vicon.build_sequence(spec,walks,output,build,processes=1,encoder=encoder)
+    assert (changed['rendered'],changed['reused'],changed['removed'])==(1,2,1)
+    assert changed['joined']
+    for segment in changed['plan']['segments']:
+        path=os.path.join(build,segment['key']+'.mp4')
+        if segment['kind']=='trial':
+            assert os.stat(path).st_mtime_ns==clips[segment['key']]
+        else:
+            assert segment['key'] not in clips
+    assert not any(os.path.exists(os.path.join(build,key+'.mp4'))
+                   for key in clips if key not in changed['plan']['jobs'])
+
+    #one more trial: only its clip is rendered
+    trials=[dict(_spec()['trials'][0],count=3)]
+    more=vicon.build_sequence(_spec(trials=trials,rest=spec['rest']),walks,output,build,
+                              processes=1,encoder=encoder)
+    assert (more['rendered'],more['reused'])==(1,3)
+    with open(more['events']) as f:
+        rows=list(csv.DictReader(f))
+    assert [row['kind'] for row in rows]==['trial','rest']*3
+    assert rows[-1]['onset_frame']==str(3*9+2*12)
@@ -0,0 +1,28 @@
+import time
+
+import pytest
+
+import vicon
+from vicon.tracing import _map_jobs
+
+def _job(seconds):
+    #a job of a worker process: sleeps (or fails, if negative) and
+    #returns the record of its stage
+    if seconds<0:
+        raise RuntimeError('failed job')
+    time.sleep(seconds)
+    return [{'stage':'sleep','seconds':seconds,'frames':1,'peak_memory':None}]
+
+@pytest.mark.parametrize('processes',[1,2])
+def test_map_jobs_records(processes):
+    tracer=vicon.Tracer()
+    results=list(_map_jobs(_job,[0.01,0.02,0.03],processes,tracer))
+    assert [records[0]['seconds'] for records in results]==[0.01,0.02,0.03]
+    assert tracer.summary()['sleep']['frames']==3
+
+def test_map_jobs_cancel():
+    #a failed job does not wait for the jobs still queued
+    start=time.perf_counter()
+    with pytest.raises(RuntimeError,match='failed job'):
+        list(_map_jobs(_job,[-1]+[1]*20,2))
+    assert time.perf_counter()-start<8
@@ -1,6 +1,75 @@
-from .preprocess import *
-from .make_video import *
-from .scrambled_video import *
-from .central_dot import *
-from .gen_detector_intro import *
-from .create_video_sequence import *
+__version__='0.25'
+
+import sys as _sys
+from types import ModuleType as _ModuleType
+
+#the functions are imported from their modules when first used,
+#so that importing vicon is fast (numpy, pandas and matplotlib
+#are only imported by the functions that need them)
+_modules={'preprocess':'preprocess',
+          'preprocess_batch':'preprocess_batch',
+          'fill_gaps':'gapfill',
+          'rotation_angle':'reframe',
+          'reframe':'reframe',
+          'read_vicon':'read_vicon',
+          'is_trajectory_file':'trajectory_file',
+          'TrajectoryWriter':'trajectory_file',
+          'save_trajectory':'trajectory_file',
+          'load_trajectory':'trajectory_file',
+          'count_frames':'trajectory_file',
+          'read_frames':'trajectory_file',
+          'frame_index':'frame_index',
+          'Trajectory':'trajectory',
+          'projection_matrix':'raster',
+          'project':'raster',
+          'rasterize':'raster',
+          'FRAME_SIZE':'raster',
+          'resample':'resample',
+          'project_views':'projection',
+          'skeleton_edges':'skeleton',
+          'Tracer':'tracing',
+          'VideoEncoder':'encoder',
+          'ClipCache':'cache',
+          'Playback':'playback',
+          'MemorySink':'playback',
+          'make_video':'make_video',
+          'scramble':'scramble',
+          'scrambled_video':'scrambled_video',
+          'render_batch':'render_batch',
+          'central_dot':'central_dot',
+          'gen_detector_intro':'gen_detector_intro',
+          'segment_encoder':'assemble',
+          'assemble':'assemble',
+          'create_video_sequence':'create_video_sequence',
+          'SEQUENCE_SPEC':'sequence_plan',
+          'plan_sequence':'sequence_plan',
+          'build_sequence':'sequence_plan',
+          'sequence_events':'sequence_plan',
+          'save_events':'sequence_plan',
+          'synthetic_capture':'benchmark',
+          'benchmark':'benchmark'}
+
+__all__=list(_modules)
+
+def __getattr__(name):
+    import importlib
+
+    if name not in _modules:
+        raise AttributeError("module 'vicon' has no attribute '"+name+"'")
+    value=getattr(importlib.import_module('.'+_modules[name],__name__),name)
+    globals()[name]=value
+    return value
+
+def __dir__():
+    return sorted(set(globals())|set(__all__))
+
+class _Package(_ModuleType):
+    #importing a module (e.g. vicon.make_video) binds it to the
+    #package, hiding the function of the same name: the function
+    #is bound instead (the module stays in sys.modules)
+    def __setattr__(self,name,value):
+        if _modules.get(name)==name and isinstance(value,_ModuleType):
+            value=getattr(value,name)
+        super().__setattr__(name,value)
+
+_sys.modules[__name__].__class__=_Package
@@ -0,0 +1,112 @@
+def segment_encoder(encoder=None,fps=30,gop=None):
+    '''Video encoding options shared by all the segments
+    of a sequence (see vicon.VideoEncoder), so that they
+    can be joined by vicon.assemble without re-encoding.
+
+    Besides the codec, bitrate and pixel format given by
+    encoder, every segment gets the same keyframe interval
+    (no scene-cut keyframes, so the GOPs are aligned to the
+    start of each segment) and the same time base.
+
+    Parameters
+    ----------
+    encoder: dict, None, optional
+        Video encoding options (see vicon.VideoEncoder).
+        (default=None, i.e. libx264 at 1800 kbit/s)
+    fps: int, optional
+        Frames per second of the segments. (default=30)
+    gop: int, None, optional
+        Frames between keyframes. If None, one keyframe
+        per second (fps). (default=None)
+
+    Returns
+    -------
+    options: dict,
+        Encoding options, to be passed as the encoder
+        argument of each segment (e.g. vicon.make_video)
+
+    See Also
+    --------
+    assemble: joins the segments of a sequence
+
+    Example
+    -------
+    options=vicon.segment_encoder({'crf':18})
+    vicon.central_dot('rest.mp4',3,encoder=options)
+    vicon.make_video('walk.traj','walk.mp4',framerange=[0,900],encoder=options)
+    vicon.assemble(['rest.mp4','walk.mp4','rest.mp4'],'sequence.mp4')
+    '''
+    if encoder is not None and not isinstance(encoder,dict):
+        raise TypeError('encoder must be a dict of encoding options')
+    options=dict(encoder or {})
+    gop=str(int(fps if gop is None else gop))
+    options['extra_args']=list(options.get('extra_args') or [])+[
+        '-g',gop,'-keyint_min',gop,'-sc_threshold','0','-video_track_timescale','90000']
+    return options
+
+def assemble(segments,filename_out,tracer=None):
+    '''Joins video segments encoded with the same options
+    (see vicon.segment_encoder) into one video, copying
+    the encoded streams (no re-encoding).
+
+    The list of segments is passed to ffmpeg through its
+    standard input, so no list file is written, and the
+    output can be a file, a named pipe (FIFO) or 'pipe:1'
+    (standard output); pipes receive a fragmented MP4.
+
+    Parameters
+    ----------
+    segments: list of str,
+        Paths and names of the segments, in order (the same
+        segment can be repeated)
+    filename_out: str,
+        Path and name of the video file to be created, path
+        of a named pipe, or 'pipe:1'
+    tracer: vicon.Tracer, None, optional
+        Collects the time spent in each stage (see
+        vicon.Tracer). (default=None)
+
+    Returns
+    -------
+    (none) (output video is saved in the specified filename_out)
+
+    See Also
+    --------
+    segment_encoder: encoding options shared by the segments
+    create_video_sequence: creates the video sequence of an
+        experiment
+
+    Example
+    -------
+    vicon.assemble(['intro.mp4','rest3s.mp4','walk.mp4','rest3s.mp4'],'sequence.mp4')
+    '''
+    import os
+    import subprocess
+    from .tracing import _get_tracer
+
+    #paths are given as file: urls, so that they are not read as
+    #relative to the list (which is read from pipe:0)
+    lines=''.join("file 'file:"+os.path.abspath(segment).replace("'","'\\''")+"'\n"
+                  for segment in segments)
+    command=['ffmpeg','-loglevel','error','-f','concat','-safe','0',
+             '-protocol_whitelist','file,pipe,fd','-i','pipe:0','-c','copy']
+    filename_out=str(filename_out)
+    if _is_pipe(filename_out):
+        #pipes cannot be rewound to write the index at the start
+        command+=['-f','mp4','-movflags','frag_keyframe+empty_moov']
+    command+=['-y',filename_out]
+
+    with _get_tracer(tracer).stage('concat'):
+        proc=subprocess.run(command,input=lines.encode('utf-8'),stderr=subprocess.PIPE)
+    if proc.returncode!=0:
+        raise RuntimeError('ffmpeg failed writing '+filename_out+': '
+                           +proc.stderr.decode('utf-8','replace').strip())
+
+def _is_pipe(filename):
+    #True for 'pipe:' outputs and named pipes (FIFO)
+    import os
+    import stat
+
+    filename=str(filename)
+    return filename.startswith('pipe:') or (os.path.exists(filename)
+                                            and stat.S_ISFIFO(os.stat(filename).st_mode))
@@ -0,0 +1,239 @@
+def synthetic_capture(filename,numframes=3600,rate=120,seed=0,gaps=0):
+    '''Writes a synthetic CSV file in the format of the
+    VICON Motion Capture exports (a Devices block and a
+    Trajectories block with 20 markers), with a figure
+    walking around the room, for tests and benchmarks.
+
+    Parameters
+    ----------
+    filename: str,
+        Path and name of the CSV file to be created
+    numframes: int, optional
+        Number of frames. (default=3600)
+    rate: float, optional
+        Capture rate, in Hz. (default=120)
+    seed: int, optional
+        Seed of the random marker positions. (default=0)
+    gaps: int, optional
+        Number of gaps (5 frames with a missing marker)
+        inserted at random. (default=0)
+
+    Returns
+    -------
+    xyz: numpy array (frames x 20 x 3),
+        The marker trajectories written to the file
+        (missing markers are NaN)
+    '''
+    import numpy as np
+
+    rng=np.random.default_rng(seed)
+    t=np.arange(numframes)/rate
+    #body shape, turning along a circle of 2 m, with some sway
+    base=rng.normal(0,300,(20,3))
+    base[:,2]+=1000
+    angle=(0.03*2*np.pi*t)[:,None]
+    sway=np.arange(20)[None,:]
+    xyz=np.empty((numframes,20,3))
+    xyz[:,:,0]=(2000*np.cos(angle)+base[:,0]*np.cos(angle)-base[:,1]*np.sin(angle)
+                +20*np.sin(7*t[:,None]+sway))
+    xyz[:,:,1]=(2000*np.sin(angle)+base[:,0]*np.sin(angle)+base[:,1]*np.cos(angle)
+                +20*np.cos(5*t[:,None]+sway))
+    xyz[:,:,2]=base[:,2]+30*np.sin(3*t[:,None]+sway)
+    for start,marker in zip(rng.integers(0,max(numframes-5,1),gaps),rng.integers(0,20,gaps)):
+        xyz[start:start+5,marker]=np.nan
+
+    data=np.empty((numframes,62))
+    data[:,0]=np.arange(1,numframes+1)
+    data[:,1]=0
+    data[:,2:]=xyz.reshape(numframes,60)
+    with open(filename,'w',newline='') as f:
+        f.write('Devices\r\n'+str(rate*10)+'\r\n,,Force Plate\r\nFrame,Sub Frame,Fx\r\n,,N\r\n1,0,0\r\n\r\n')
+        f.write('Trajectories\r\n'+str(rate)+'\r\n')
+        f.write(',,'+',,,'.join('Subject:M'+str(m) for m in range(20))+',,\r\n')
+        f.write('Frame,Sub Frame,'+','.join(['X,Y,Z']*20)+'\r\n')
+        f.write(',,'+','.join(['mm']*60)+'\r\n')
+        text=np.char.mod('%.5f',data[:,2:])
+        text[np.isnan(data[:,2:])]=''
+        for i in range(numframes):
+            f.write(str(i+1)+',0,'+','.join(text[i])+'\r\n')
+    return xyz
+
+def benchmark(numframes=3600,render_frames=300,stages=None,repeat=1,memory=True,
+              output=None,workdir=None,progress=print):
+    '''Times each stage of the processing pipeline on
+    a synthetic capture (see vicon.synthetic_capture),
+    so that the performance of different versions or
+    machines can be compared.
+
+    Stages:
+        'parse': reading the Trajectories block (read_vicon)
+        'reframe': shoulder reference frame (reframe)
+        'preprocess': parse, reframe and save a .traj file
+        'read': reading the frames of the .traj file
+        'scramble': constrained scrambling (scramble)
+        'project': projection to pixels (project_views)
+        'draw': drawing the frames (rasterize)
+        'encode': encoding frames with ffmpeg (VideoEncoder)
+        'render_raster': make_video with the raster backend
+        'render_matplotlib': make_video with matplotlib
+
+    Parameters
+    ----------
+    numframes: int, optional
+        Number of frames of the synthetic capture. (default=3600)
+    render_frames: int, optional
+        Number of frames used by the drawing, encoding and
+        rendering stages, which are much slower. (default=300)
+    stages: list of str, None, optional
+        Stages to be run. If None, runs all. (default=None)
+    repeat: int, optional
+        Number of runs of each stage; the fastest is
+        reported. (default=1)
+    memory: bool, optional
+        If True, each stage is run once more with tracemalloc
+        to measure its peak memory. (default=True)
+    output: str, None, optional
+        Path and name of a JSON file where the results are
+        saved. (default=None)
+    workdir: str, None, optional
+        Folder of the temporary files. If None, a temporary
+        folder is used. (default=None)
+    progress: function, None, optional
+        Called with a line of text after each stage.
+        (default=print)
+
+    Returns
+    -------
+    results: dict,
+        'version', 'python', 'numpy', 'platform', 'date',
+        'numframes', 'render_frames' and 'stages': for each
+        stage, 'seconds', 'frames', 'fps' and 'peak_memory'
+        (bytes, or None), or 'error' if it failed
+
+    Example
+    -------
+    results=vicon.benchmark(numframes=12000,output='benchmark_0.25.json')
+    (or, from the command line: python -m vicon.benchmark --frames 12000 --output benchmark_0.25.json)
+    '''
+    import os
+    import gc
+    import json
+    import time
+    import platform
+    import datetime
+    import tempfile
+    import tracemalloc
+    import numpy as np
+    from . import __version__
+    from .read_vicon import read_vicon
+    from .reframe import reframe
+    from .preprocess import preprocess
+    from .trajectory_file import read_frames
+    from .scramble import scramble
+    from .projection import project_views,_center
+    from .raster import rasterize
+    from .encoder import VideoEncoder
+    from .make_video import make_video
+
+    temp=None
+    if workdir is None:
+        temp=tempfile.TemporaryDirectory()
+        workdir=temp.name
+    raw=os.path.join(workdir,'capture.csv')
+    traj=os.path.join(workdir,'capture.traj')
+    video=os.path.join(workdir,'video.mp4')
+    synthetic_capture(raw,numframes)
+    preprocess(raw,traj,progress=lambda status: None)
+    xyz,_=read_frames(traj)
+    xyz,lims=_center(xyz,(800,800,1200))
+    n=min(render_frames,numframes)
+    points=project_views(xyz[:n],[(0,0)],lims)[0]
+    frame=next(rasterize(points[:1])).copy()
+
+    def parse():
+        _,chunks=read_vicon(raw)
+        for _ in chunks:
+            pass
+
+    def encode():
+        with VideoEncoder(video) as enc:
+            for _ in range(n):
+                enc.write(frame)
+
+    def draw():
+        for _ in rasterize(points):
+            pass
+
+    runs={'parse':(parse,numframes),
+          'reframe':(lambda: reframe(xyz,center='shoulder'),numframes),
+          'preprocess':(lambda: preprocess(raw,traj,progress=lambda status: None),numframes),
+          'read':(lambda: np.array(read_frames(traj)[0]),numframes),
+          'scramble':(lambda: scramble(xyz,'constrained',seed=0),numframes),
+          'project':(lambda: project_views(xyz,[(0,0)],lims),numframes),
+          'draw':(draw,n),
+          'encode':(encode,n),
+          'render_raster':(lambda: make_video(traj,video,framerange=n,axislims=(800,800,1200),
+                                              backend='raster'),n),
+          'render_matplotlib':(lambda: make_video(traj,video,framerange=n,
+                                                  axislims=(800,800,1200)),n)}
+    if stages is None:
+        stages=list(runs)
+
+    results={'version':__version__,'python':platform.python_version(),'numpy':np.__version__,
+             'platform':platform.platform(),'date':datetime.datetime.now().isoformat(),
+             'numframes':numframes,'render_frames':n,'stages':{}}
+    try:
+        for stage in stages:
+            function,frames=runs[stage]
+            try:
+                seconds=None
+                for _ in range(repeat):
+                    gc.collect()
+                    start=time.perf_counter()
+                    function()
+                    elapsed=time.perf_counter()-start
+                    seconds=elapsed if seconds is None else min(seconds,elapsed)
+                peak=None
+                if memory:
+                    gc.collect()
+                    tracemalloc.start()
+                    try:
+                        function()
+                        peak=tracemalloc.get_traced_memory()[1]
+                    finally:
+                        tracemalloc.stop()
+                result={'seconds':seconds,'frames':frames,'fps':frames/seconds,'peak_memory':peak}
+                line=(stage.ljust(18)+'%9.3f s %10.0f fps'%(seconds,frames/seconds)
+                      +('' if peak is None else '%9.1f MB'%(peak/2**20)))
+            except Exception as e:
+                result={'error':repr(e)}
+                line=stage.ljust(18)+'failed: '+repr(e)
+            results['stages'][stage]=result
+            if progress is not None:
+                progress(line)
+    finally:
+        if temp is not None:
+            temp.cleanup()
+
+    if output is not None:
+        with open(output,'w') as f:
+            json.dump(results,f,indent=1)
+    return results
+
+def _main(args=None):
+    import argparse
+
+    parser=argparse.ArgumentParser(prog='python -m vicon.benchmark',
+                                   description='Times each stage of the vicon pipeline on a synthetic capture')
+    parser.add_argument('--frames',type=int,default=3600,help='frames of the synthetic capture')
+    parser.add_argument('--render-frames',type=int,default=300,help='frames drawn, encoded and rendered')
+    parser.add_argument('--stages',nargs='+',default=None,help='stages to be run (default: all)')
+    parser.add_argument('--repeat',type=int,default=1,help='runs of each stage (the fastest is reported)')
+    parser.add_argument('--no-memory',action='store_true',help='do not measure the peak memory')
+    parser.add_argument('--output',default=None,help='JSON file where the results are saved')
+    options=parser.parse_args(args)
+    benchmark(options.frames,options.render_frames,options.stages,options.repeat,
+              not options.no_memory,options.output)
+
+if __name__=='__main__':
+    _main()
@@ -0,0 +1,196 @@
+class ClipCache:
+    '''On-disk cache of rendered video clips, so that
+    clips already rendered with the same parameters (e.g.
+    the intro and rest clips, or a repeated stimulus
+    window) are copied instead of rendered again.
+
+    Clips are stored under a key that hashes the
+    rendering function, its parameters (including the
+    frame window and the seed), the contents of the input
+    file and the package version. When the cache grows
+    beyond max_size, the least recently used clips are
+    removed.
+
+    Parameters
+    ----------
+    directory: str,
+        Folder of the cache (created if needed)
+    max_size: int, None, optional
+        Maximum total size of the cached clips, in bytes.
+        If None, the cache is not bounded. (default=None)
+
+    Example
+    -------
+    cache=vicon.ClipCache('clip_cache',max_size=2*1024**3)
+    key=cache.key('central_dot',{'seconds':3,'detector':0.3})
+    cache.fetch(key,'rest3s.mp4',lambda f: vicon.central_dot(f,3,detector=0.3))
+    '''
+    def __init__(self,directory,max_size=None):
+        import os
+
+        self.directory=os.path.abspath(directory)
+        self.max_size=max_size
+        os.makedirs(self.directory,exist_ok=True)
+
+    def key(self,function,params,filename_in=None):
+        '''Hash (hexadecimal str) identifying a clip
+
+        Parameters
+        ----------
+        function: str,
+            Name of the rendering function
+        params: dict,
+            Parameters of the rendering (JSON serializable),
+            without the input and output file names
+        filename_in: str, vicon.Trajectory, None, optional
+            Input trajectory file (or Trajectory), whose
+            contents are hashed
+        '''
+        return _clip_key(function,params,filename_in)
+
+    def path(self,key,ext='.mp4'):
+        '''Path of the cached clip with the given key'''
+        import os
+
+        return os.path.join(self.directory,key+ext)
+
+    def get(self,key,ext='.mp4'):
+        '''Path of the cached clip, or None if it is not
+        in the cache. The clip is marked as recently used.
+        '''
+        import os
+
+        path=self.path(key,ext)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self,key,filename,ext='.mp4'):
+        '''Copies a rendered clip into the cache and
+        removes the least recently used clips if the cache
+        is full. Returns the path of the cached clip.
+        '''
+        import os
+        import shutil
+
+        path=self.path(key,ext)
+        #copied under a temporary name, so that other processes
+        #never see a partial clip
+        temp=path+'.'+str(os.getpid())+'.tmp'
+        shutil.copyfile(filename,temp)
+        os.replace(temp,path)
+        self.evict()
+        return path
+
+    def fetch(self,key,filename_out,render,ext='.mp4'):
+        '''Copies the cached clip to filename_out or, if it
+        is not in the cache, calls render(filename_out) and
+        stores the result.
+
+        Returns
+        -------
+        hit: bool,
+            True if the clip was in the cache
+        '''
+        import shutil
+
+        path=self.get(key,ext)
+        if path is not None:
+            try:
+                shutil.copyfile(path,filename_out)
+                return True
+            except FileNotFoundError:
+                pass #evicted meanwhile by another process
+        render(filename_out)
+        self.put(key,filename_out,ext)
+        return False
+
+    def size(self):
+        '''Total size of the cached clips, in bytes'''
+        return sum(size for _,size,_ in self._entries())
+
+    def evict(self,max_size=None):
+        '''Removes the least recently used clips until the
+        cache is not larger than max_size (by default, the
+        max_size of the cache).
+        '''
+        import os
+
+        if max_size is None:
+            max_size=self.max_size
+        if max_size is None:
+            return
+        entries=sorted(self._entries(),key=lambda entry: entry[2])
+        total=sum(size for _,size,_ in entries)
+        for path,size,_ in entries:
+            if total<=max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total-=size
+
+    def clear(self):
+        '''Removes all cached clips'''
+        self.evict(0)
+
+    def _entries(self):
+        #(path, size, last use) of the cached clips
+        import os
+
+        entries=[]
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.tmp') or not entry.is_file():
+                    continue
+                try:
+                    stat=entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((entry.path,stat.st_size,stat.st_mtime_ns))
+        return entries
+
+def _clip_key(function,params,filename_in=None):
+    #hash of the rendering function, its parameters, the input and
+    #the package version (see ClipCache.key)
+    import json
+    import hashlib
+    from . import __version__
+
+    description={'function':function,'params':params,'version':__version__,
+                 'input':None if filename_in is None else _input_digest(filename_in)}
+    text=json.dumps(description,sort_keys=True,default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+#digests of the input files already hashed by this process
+_digests={}
+
+def _input_digest(filename_in):
+    #digest of an input file or Trajectory
+    import hashlib
+    import numpy as np
+    from .trajectory import Trajectory
+
+    if not isinstance(filename_in,Trajectory):
+        return _file_digest(filename_in)
+    h=hashlib.sha256(repr((filename_in.xyz.shape,filename_in.rate,
+                           filename_in.markers)).encode('utf-8'))
+    h.update(np.ascontiguousarray(filename_in.xyz))
+    return h.hexdigest()
+
+def _file_digest(filename):
+    import os
+    import hashlib
+
+    stat=os.stat(filename)
+    ident=(os.path.abspath(filename),stat.st_size,stat.st_mtime_ns)
+    if ident not in _digests:
+        h=hashlib.sha256()
+        with open(filename,'rb') as f:
+            for block in iter(lambda: f.read(1<<24),b''):
+                h.update(block)
+        _digests[ident]=h.hexdigest()
+    return _digests[ident]
@@ -1,4 +1,5 @@
-def central_dot(filename_out,seconds,fps=30,detector=None):
+def central_dot(filename_out,seconds,fps=30,detector=None,encoder=None,tracer=None,
+                events=None):
     ''' Generate a video of a central dot
         running for the defined number of
         seconds, typically used as resting
@@ -8,7 +9,7 @@ def central_dot(filename_out,seconds,fps=30,detector=None):
     ----------
     filename_out: str,
         Path and name of the MP4 video file to be created
-    seconds: int,
+    seconds: float,
         Length in seconds of the video file to be created
     fps: int, optional
         Frames per second of the generated video. (default=30)
@@ -17,6 +18,19 @@ def central_dot(filename_out,seconds,fps=30,detector=None):
         with brightness provided by the user (0-1).
         Otherwise, detector is set to None and no corner
         is drawn
+    encoder: dict, vicon.VideoEncoder, None, optional
+        Video encoding options (see vicon.VideoEncoder, e.g.
+        {'crf':18,'preset':'fast'}), or an open VideoEncoder
+        receiving the frames, in which case filename_out is
+        not used. (default=None, i.e. libx264 at 1800 kbit/s)
+    tracer: vicon.Tracer, None, optional
+        Collects the time spent in each stage (see
+        vicon.Tracer). (default=None)
+    events: str, None, optional
+        Path and name of a CSV file where the events of the
+        clip are saved (detector level, with onsets from the start of
+        the clip, see vicon.sequence_events). If None, they
+        are not saved. (default=None)
     
     Returns
     -------
@@ -41,23 +55,12 @@ def central_dot(filename_out,seconds,fps=30,detector=None):
         15,detector=0.7)
     '''
     import numpy as np
-    import pandas as pd
-    import matplotlib
-    matplotlib.use('TkAgg') # Needed to run on mac
-    from matplotlib import pyplot as plt
-    from mpl_toolkits.mplot3d import Axes3D
-    from matplotlib.colors import cnames
-    from matplotlib import animation
+    from matplotlib import style
     from matplotlib import patches as patches
+    from .encoder import _write_frames,_figure,_figure_frame
+    from .sequence_plan import _save_clip_events
  
-    numframes=seconds*fps
-
-    #generate figure
-    fig = plt.figure()
-    plt.style.use('dark_background')
-    fig.subplots_adjust(left=0, bottom=0, right=1, top=1, wspace=None, hspace=None)
-    fig.set_size_inches(13.66, 7.68, forward=True)
-    ax = plt.axes()
+    numframes=int(round(seconds*fps))
 
     def animate(i):
         #plot the points
@@ -70,16 +73,20 @@ def central_dot(filename_out,seconds,fps=30,detector=None):
             ax.add_patch(patches.Rectangle((0.95,0.85),0.1,0.3,fill=True,fc=(detector,detector,detector),zorder=2,clip_on=False))
         ax.patch.set_facecolor('black')
         fig.set_facecolor('black')
-        plt.axis('off')
-        plt.grid(b=None)
-
-    #make animation
-    ani = animation.FuncAnimation(fig, animate, frames=numframes)
+        ax.axis('off')
+        ax.grid(False)
 
-    #setting up animation file
-    Writer = animation.writers['ffmpeg']
-    writer = animation.FFMpegWriter(fps=fps,metadata=dict(artist='NeuroMat'),bitrate=1800,extra_args=['-vcodec','libx264'])
+    #all frames are the same: render once and encode it repeatedly
+    def frames():
+        animate(0)
+        frame=np.ascontiguousarray(_figure_frame(fig)[:,:,:3])
+        for i in range(numframes):
+            yield frame
 
-    #save animation
-    ani.save(filename_out, writer=writer)
-    plt.close()
+    #generate figure (the style is only set while rendering)
+    with style.context('dark_background'):
+        fig = _figure()
+        ax = fig.add_subplot(111)
+        _write_frames(frames(),encoder,filename_out,fps,tracer)
+    if events is not None:
+        _save_clip_events(events,'rest','central_dot',numframes,fps,detector=detector)
@@ -1,4 +1,6 @@
-def create_video_sequence(path_to_vicon_files,preprocessed_vicon_filenames,video_seq_name):
+def create_video_sequence(path_to_vicon_files,preprocessed_vicon_filenames,video_seq_name,
+                          processes=None,seed=None,cache_dir=None,cache_size=None,
+                          tracer=None,encoder=None,events=None):
     ''' Creates a video sequence of visual
         stimulii for Neuroscience experiment
 
@@ -7,14 +9,59 @@ def create_video_sequence(path_to_vicon_files,preprocessed_vicon_filenames,video
         path_to_vicon_files: str,
             The path to where the preprocessed Vicon
             files are saved
-        preprocessed_vicon_filenames: list of str,
-            The names of the preprocessed Vicon files 
+        preprocessed_vicon_filenames: list of str, vicon.Trajectory,
+            The names of the preprocessed Vicon files
+            (CSV or binary trajectory files), or their
+            Trajectory objects
         video_seq_name: str,
             The name of the video file to be generated
+            (relative to path_to_vicon_files), or a named
+            pipe or 'pipe:1' (see vicon.assemble)
+        processes: int, None, optional
+            Number of worker processes rendering the clips
+            concurrently. If None, uses the number of CPUs;
+            if 1, renders the clips one after another.
+            (default=None)
+        seed: int, None, optional
+            Seed of the random choices (stimulus order, walk
+            files, start frames and scrambling, see
+            vicon.plan_sequence), for reproducible sequences.
+            (default=None)
+        cache_dir: str, None, optional
+            Folder of a clip cache (see vicon.ClipCache).
+            Clips already rendered with the same parameters
+            and input file are copied from the cache instead
+            of rendered again. If None, no cache is used.
+            (default=None)
+        cache_size: int, None, optional
+            Maximum size of the clip cache, in bytes. The
+            least recently used clips are removed when it is
+            exceeded. If None, the cache is not bounded.
+            (default=None)
+        tracer: vicon.Tracer, None, optional
+            Collects the time spent in each stage (see
+            vicon.Tracer). The stages of the clips are timed
+            in the worker processes, and are not profiled.
+            (default=None)
+        encoder: dict, None, optional
+            Video encoding options of the clips (see
+            vicon.VideoEncoder). All clips are encoded with
+            the same options and keyframe interval (see
+            vicon.segment_encoder), so they are joined without
+            re-encoding. With {'dedupe':True}, the rests and
+            the intro are encoded once per still frame.
+            (default=None, i.e. libx264 at 1800 kbit/s)
+        events: str, None, optional
+            Path and name of the event table (CSV) with the
+            onset frame and time of each segment (see
+            vicon.sequence_events). If None, it is saved next
+            to the video, named after it with '_events.csv'
+            (in path_to_vicon_files if the video is written to
+            a pipe). (default=None)
 
     -----------
     Output:
-        (none) (video file to be save at Vicon folder)
+        (none) (video file and event table to be save at Vicon folder)
     
     -----------
     Description:
@@ -35,68 +82,72 @@ def create_video_sequence(path_to_vicon_files,preprocessed_vicon_filenames,video
     where is calibrated a fast-response light
     detector used for synchronization of the
     EEG data with the stimulus presentation.
+
+    The experiment is described by vicon.SEQUENCE_SPEC,
+    compiled by vicon.plan_sequence: the walks of the
+    trials are drawn from all preprocessed files. Other
+    designs (and rebuilds that only render the clips that
+    changed) are made with vicon.build_sequence.
     
     '''
 
-    #going to folder where vicon files are stored
     import os
-    import numpy as np
-    import vicon
-    os.chdir(path_to_vicon_files)
-    os.mkdir("temp")
+    import tempfile
+    from .trajectory import Trajectory
+    from .tracing import _map_jobs
+    from .assemble import assemble
+    from .sequence_plan import (SEQUENCE_SPEC,plan_sequence,sequence_events,save_events,
+                                _events_path)
+    if cache_dir is not None:
+        cache_dir=os.path.abspath(cache_dir)
+    #the vicon files and the sequence are in path_to_vicon_files,
+    #the clips in a temporary folder (removed at the end)
+    if not str(video_seq_name).startswith('pipe:'):
+        video_seq_name=os.path.join(path_to_vicon_files,video_seq_name)
+    if events is None:
+        events=_events_path(video_seq_name,path_to_vicon_files)
+    walks=[walk if isinstance(walk,Trajectory) else os.path.join(path_to_vicon_files,walk)
+           for walk in preprocessed_vicon_filenames]
 
-    #defining order of stimulus within sequence blocks
-    video_seq=np.empty((11,3))
-    for i in range(3):
-        seq=np.array([0]*5+[1]*5)
-        np.random.shuffle(seq)
-        seq=np.append(seq,2)
-        video_seq[:,i]=seq
-    
-    #preparing the videos
-    names='file temp\\\\intro.mp4\n'
-    vicon.gen_detector_intro('temp\\intro.mp4',15)
-    vicon.central_dot('temp\\rest3s.mp4',3,detector=0.3)
-    vicon.central_dot('temp\\rest15s.mp4',15,detector=0.3)
-    
-    for j in range(3):
-        for i in range(11):
-            if video_seq[i,j]==1:
-                walk=np.random.randint(1,len(preprocessed_vicon_filenames))
-                walk_name=preprocessed_vicon_filenames[walk-1]
-                with open(walk_name) as f:
-                    n_lines=sum(1 for line in f)
-                filename_out='temp\\\\'+'video'+str(j)+f'{i:03}'+'.mp4'
-                names+="file "+filename_out+"\n"
-                startframe=np.random.randint(300,n_lines-30*31)
-                vicon.make_video(walk_name,filename_out,
-                                 framerange=[startframe,startframe+30*30],
-                                 edgetype=None,axislims=(800,800,1200))
-            elif video_seq[i,j]==0:
-                walk=np.random.randint(1,len(preprocessed_vicon_filenames))
-                walk_name=preprocessed_vicon_filenames[walk-1]
-                with open(walk_name) as f:
-                    n_lines=sum(1 for line in f)
-                filename_out='temp\\\\'+'video'+str(j)+f'{i:03}'+'.mp4'
-                names+="file "+filename_out+"\n" 
-                startframe=np.random.randint(300,n_lines-30*31)
-                vicon.scrambled_video(walk_name,filename_out,
-                                 framerange=[startframe,startframe+30*30],
-                                 detector=1,scrambletype='constraint',
-                                      axislims=(800,800,1200),detector_loc=(1350,1400))
-            if i<10:
-                names+='file temp\\\\rest3s.mp4\n'
-            if video_seq[i,j]==2:
-                names+='file temp\\\\rest15s.mp4\n'
-            
-    #generating ffmpeg join videos command
-    f=open('videonames.txt','w')
-    f.write(names)
-    f.close()
-    command="ffmpeg -f concat -safe 0 -i videonames.txt -c copy " + video_seq_name
-    
-    #calling ffmpeg via command prompt
-    #(it's much faster to use it via cmd than within Python)
-    #(fill the part inside " ")
-    fullstr='cmd /c "' + command + ' && del /q temp && rmdir /q temp && del /q videonames.txt"'
-    os.system(fullstr)
+    #planning the clips and the segments of the sequence (the
+    #random choices are made here, so the sequence does not
+    #depend on the rendering order)
+    plan=plan_sequence(dict(SEQUENCE_SPEC,seed=seed),walks,encoder)
+
+    #rendering the clips, each once (matplotlib is not thread-safe,
+    #so the clips are rendered in separate processes)
+    #(the stages timed by the workers are added to the tracer)
+    with tempfile.TemporaryDirectory() as temp:
+        clips={key:os.path.join(temp,key+'.mp4') for key in plan['jobs']}
+        jobs=[(function,dict(kwargs,filename_out=clips[key]),cache_dir,cache_size,
+               tracer is not None) for key,(function,kwargs) in plan['jobs'].items()]
+        list(_map_jobs(_render_clip,jobs,processes,tracer))
+
+        #joining the clips (stream copy, without re-encoding)
+        assemble([clips[segment['key']] for segment in plan['segments']],video_seq_name,tracer)
+    save_events(sequence_events(plan),events)
+
+def _render_clip(job):
+    #renders one clip of the sequence (run in a worker process),
+    #returning the records of the traced stages
+    from .make_video import make_video
+    from .scrambled_video import scrambled_video
+    from .central_dot import central_dot
+    from .gen_detector_intro import gen_detector_intro
+    functions={'make_video':make_video,'scrambled_video':scrambled_video,
+               'central_dot':central_dot,'gen_detector_intro':gen_detector_intro}
+    from .tracing import Tracer
+    name,kwargs,cache_dir,cache_size,trace=job
+    records=[]
+    tracer=Tracer(callback=records.append) if trace else None
+    render=lambda filename_out: functions[name](**dict(kwargs,filename_out=filename_out,
+                                                        tracer=tracer))
+    if cache_dir is None:
+        render(kwargs['filename_out'])
+        return records
+    from .cache import ClipCache
+    cache=ClipCache(cache_dir,cache_size)
+    params={k:v for k,v in kwargs.items() if k not in ('filename_in','filename_out')}
+    key=cache.key(name,params,kwargs.get('filename_in'))
+    cache.fetch(key,kwargs['filename_out'],render)
+    return records
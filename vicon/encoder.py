@@ -0,0 +1,309 @@
+class VideoEncoder:
+    '''Encodes video frames by writing raw rgb24 frames
+    to the standard input of an ffmpeg process.
+
+    The same encoder can receive the frames of several
+    clips (e.g. by passing it as the encoder argument of
+    vicon.make_video, vicon.scrambled_video,
+    vicon.central_dot and vicon.gen_detector_intro), so
+    that a whole sequence is encoded by a single ffmpeg
+    process.
+
+    Parameters
+    ----------
+    filename_out: str,
+        Path and name of the video file to be created
+    fps: int, optional
+        Frames per second of the video. (default=30)
+    size: tuple (2 elements), None, optional
+        Frame width and height, in pixels. If None, it is
+        taken from the first frame. (default=None)
+    codec: str, optional
+        ffmpeg video codec. (default='libx264')
+    preset: str, None, optional
+        Encoder preset (e.g. 'ultrafast', 'medium').
+        (default=None, i.e. the codec default)
+    crf: int, None, optional
+        Constant rate factor. If given, the bitrate is not
+        used. (default=None, or 18 with dedupe)
+    bitrate: int, None, optional
+        Video bitrate, in kbit/s. Not used with dedupe: the
+        bitrate of a variable frame rate video is poorly
+        controlled (its held frames, lasting seconds, are
+        encoded in grey or washed out), so a constant rate
+        factor is used instead. (default=1800)
+    pix_fmt: str, optional
+        Pixel format of the encoded video. (default='yuv420p')
+    extra_args: list of str, None, optional
+        Additional ffmpeg output arguments
+    metadata: dict, None, optional
+        Metadata of the video file.
+        (default={'artist':'NeuroMat'})
+    dedupe: bool, optional
+        If True, identical consecutive frames (e.g. rests
+        and held detector levels) are detected by comparing
+        each frame with the previous one, and only the first
+        of them is sent to ffmpeg and encoded, lasting as
+        long as all of them: the video has a variable frame
+        rate, but the same timing. The quality is set by crf,
+        not by bitrate. Requires FFmpeg>=5.1.
+        (default=False)
+
+    Example
+    -------
+    with vicon.VideoEncoder('sequence.mp4',crf=18,preset='fast') as enc:
+        vicon.central_dot(None,3,encoder=enc)
+        vicon.make_video('walk.csv',None,framerange=[0,900],encoder=enc)
+    '''
+    def __init__(self,filename_out,fps=30,size=None,codec='libx264',preset=None,
+                 crf=None,bitrate=1800,pix_fmt='yuv420p',extra_args=None,metadata=None,
+                 dedupe=False):
+        self.filename_out=filename_out
+        self.fps=fps
+        self.size=size
+        self.codec=codec
+        self.preset=preset
+        self.crf=crf
+        self.bitrate=bitrate
+        self.pix_fmt=pix_fmt
+        self.extra_args=list(extra_args) if extra_args else []
+        self.metadata={'artist':'NeuroMat'} if metadata is None else metadata
+        self.dedupe=dedupe
+        self.numframes=0
+        self.duplicates=0 #frames not encoded (dedupe)
+        self._proc=None
+        self._buffer=None
+        self._last=None #last frame and its number of repeats (dedupe)
+        self._repeats=0
+        self._sent=0 #frames sent, including the repeats (dedupe)
+
+    def command(self):
+        '''ffmpeg command line of the encoder'''
+        width,height=self.size
+        if self.dedupe:
+            #(frames with their timestamps and durations, see _mkv_header)
+            command=['ffmpeg','-loglevel','error','-f','matroska','-i','pipe:',
+                     '-fps_mode','vfr','-vcodec',self.codec]
+        else:
+            command=['ffmpeg','-loglevel','error','-f','rawvideo','-vcodec','rawvideo',
+                     '-s',str(width)+'x'+str(height),'-pix_fmt','rgb24',
+                     '-framerate',str(self.fps),'-i','pipe:','-vcodec',self.codec]
+        if self.preset is not None:
+            command+=['-preset',str(self.preset)]
+        if self.crf is not None:
+            command+=['-crf',str(self.crf)]
+        elif self.dedupe:
+            command+=['-crf','18']
+        elif self.bitrate is not None:
+            command+=['-b:v',str(self.bitrate)+'k']
+        if self.pix_fmt is not None:
+            command+=['-pix_fmt',self.pix_fmt]
+        for key,value in self.metadata.items():
+            command+=['-metadata',str(key)+'='+str(value)]
+        return command+self.extra_args+['-y',str(self.filename_out)]
+
+    def _start(self):
+        import subprocess
+        import numpy as np
+
+        width,height=self.size
+        #reusable buffer for frames that are not contiguous rgb24
+        self._buffer=np.empty((height,width,3),dtype=np.uint8)
+        self._proc=subprocess.Popen(self.command(),stdin=subprocess.PIPE)
+        if self.dedupe:
+            self._last=np.empty((height,width,3),dtype=np.uint8)
+            self._send(_mkv_header(width,height,self.fps))
+
+    def write(self,frame):
+        '''Writes one frame (height x width x 3 or 4), uint8'''
+        import numpy as np
+
+        frame=np.asarray(frame)
+        if self._proc is None:
+            if self.size is None:
+                self.size=(frame.shape[1],frame.shape[0])
+            self._start()
+        if frame.shape[:2]!=self._buffer.shape[:2]:
+            raise ValueError('frame size '+str(frame.shape[1::-1])
+                             +' does not match the encoder size '+str(tuple(self.size)))
+        if frame.dtype==np.uint8 and frame.shape[2]==3 and frame.flags.c_contiguous:
+            data=frame
+        else:
+            self._buffer[:]=frame[:,:,:3]
+            data=self._buffer
+        self.numframes+=1
+        if not self.dedupe:
+            self._send(data)
+            return
+        #(a repeated frame only makes the previous one last longer;
+        #the previous one is sent when a different frame arrives)
+        if self._repeats>0 and np.array_equal(data,self._last):
+            self._repeats+=1
+            self.duplicates+=1
+            return
+        self._flush()
+        self._last[:]=data
+        self._repeats=1
+
+    def _flush(self,end=False):
+        #sends the pending frame of dedupe, lasting its repeats
+        if self._repeats==0:
+            return
+        repeats=[self._repeats]
+        if end and self._repeats>1:
+            #(the encoders keep the timestamps of the frames, but not
+            #their durations: the last frame is sent again at the end
+            #of the video, so that the video lasts until then)
+            repeats=[self._repeats-1,1]
+        for count in repeats:
+            start=round(self._sent*1000000/self.fps)
+            self._sent+=count
+            duration=round(self._sent*1000000/self.fps)-start
+            self._send(*_mkv_frame(self._last,start,duration))
+        self._repeats=0
+
+    def _send(self,*data):
+        try:
+            for chunk in data:
+                self._proc.stdin.write(memoryview(chunk).cast('B'))
+        except BrokenPipeError:
+            self._proc.wait()
+            raise RuntimeError('ffmpeg failed writing '+str(self.filename_out))
+
+    def close(self):
+        '''Finishes the encoding and waits for ffmpeg'''
+        if self._proc is None:
+            return
+        try:
+            self._flush(end=True)
+        except RuntimeError:
+            pass #(reported below)
+        proc,self._proc=self._proc,None
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        if proc.wait()!=0:
+            raise RuntimeError('ffmpeg failed writing '+str(self.filename_out))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.close()
+
+#the frames of dedupe are sent to ffmpeg in a minimal Matroska stream
+#(uncompressed rgb24 frames, each with its timestamp and duration, in
+#microseconds), as raw video has no timestamps
+def _ebml(id,payload):
+    #EBML element (the sizes are always written with 8 bytes)
+    return id+_ebml_size(len(payload))+payload
+
+def _ebml_size(size):
+    return b'\x01'+size.to_bytes(7,'big')
+
+def _ebml_uint(id,value):
+    return _ebml(id,int(value).to_bytes(8,'big'))
+
+def _mkv_header(width,height,fps):
+    #EBML header, segment (of unknown size), info and video track;
+    #the default duration of the frames gives ffmpeg the frame rate,
+    #which would be guessed from the (sparse) timestamps otherwise
+    header=_ebml(b'\x1a\x45\xdf\xa3',
+                 _ebml_uint(b'\x42\x86',1)+_ebml_uint(b'\x42\xf7',1)
+                 +_ebml_uint(b'\x42\xf2',4)+_ebml_uint(b'\x42\xf3',8)
+                 +_ebml(b'\x42\x82',b'matroska')+_ebml_uint(b'\x42\x87',4)
+                 +_ebml_uint(b'\x42\x85',2))
+    segment=b'\x18\x53\x80\x67\x01\xff\xff\xff\xff\xff\xff\xff'
+    info=_ebml(b'\x15\x49\xa9\x66',_ebml_uint(b'\x2a\xd7\xb1',1000)
+               +_ebml(b'\x4d\x80',b'vicon')+_ebml(b'\x57\x41',b'vicon'))
+    video=_ebml(b'\xe0',_ebml_uint(b'\xb0',width)+_ebml_uint(b'\xba',height)
+                +_ebml(b'\x2e\xb5\x24',b'RGB\x18'))
+    track=_ebml(b'\xae',_ebml_uint(b'\xd7',1)+_ebml_uint(b'\x73\xc5',1)+_ebml_uint(b'\x83',1)
+                +_ebml_uint(b'\x23\xe3\x83',round(1000000000/fps))
+                +_ebml(b'\x86',b'V_UNCOMPRESSED')+video)
+    return header+segment+info+_ebml(b'\x16\x54\xae\x6b',track)
+
+def _mkv_frame(frame,start,duration):
+    #cluster of one frame: (cluster and block header, frame, block
+    #duration), so that the frame is not copied
+    size=frame.nbytes
+    timecode=_ebml_uint(b'\xe7',start)
+    block=b'\xa1'+_ebml_size(size+4)+b'\x81\x00\x00\x00'
+    end=_ebml_uint(b'\x9b',duration)
+    group=b'\xa0'+_ebml_size(len(block)+size+len(end))
+    cluster=b'\x1f\x43\xb6\x75'+_ebml_size(len(timecode)+len(group)+len(block)+size+len(end))
+    return cluster+timecode+group+block,frame,end
+
+def _open_encoder(encoder,filename_out,fps):
+    #returns the encoder to be used by a renderer, and whether
+    #the renderer owns it (and so must close it)
+    if isinstance(encoder,VideoEncoder):
+        if encoder.fps!=fps:
+            raise ValueError('fps='+str(fps)+' does not match the encoder fps='+str(encoder.fps))
+        return encoder,False
+    if encoder is None:
+        encoder={}
+    given=[key for key in ('filename_out','fps') if key in encoder]
+    if given:
+        raise ValueError('the encoder options cannot include '+', '.join(given)
+                         +' (given by the arguments of the renderer)')
+    return VideoEncoder(filename_out,fps=fps,**encoder),True
+
+def _figure():
+    #matplotlib figure of the video frames (1366x768 pixels),
+    #drawn by Agg without pyplot, so that no display or GUI
+    #backend is needed and the user's backend is not changed
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig=Figure(figsize=(13.66,7.68))
+    FigureCanvasAgg(fig)
+    fig.subplots_adjust(left=0,bottom=0,right=1,top=1)
+    return fig
+
+def _figure_frame(fig):
+    #draws a matplotlib figure and returns its RGBA buffer
+    import numpy as np
+
+    fig.canvas.draw()
+    return np.asarray(fig.canvas.buffer_rgba())
+
+def _write_frames(frames,encoder,filename_out,fps,tracer=None):
+    #encodes the frames of an iterable (drawn while iterating),
+    #timing the drawing and the encoding stages
+    import time
+    import tracemalloc
+    from .tracing import _get_tracer
+
+    tracer=_get_tracer(tracer)
+    enc,owned=_open_encoder(encoder,filename_out,fps)
+    draw,encode,numframes=0.0,0.0,0
+    peak=None
+    with tracer.capture():
+        if tracer.memory:
+            start_memory=tracemalloc.get_traced_memory()[0]
+            if hasattr(tracemalloc,'reset_peak'):
+                tracemalloc.reset_peak()
+        try:
+            frames=iter(frames)
+            while True:
+                start=time.perf_counter()
+                frame=next(frames,None)
+                middle=time.perf_counter()
+                draw+=middle-start
+                if frame is None:
+                    break
+                enc.write(frame)
+                encode+=time.perf_counter()-middle
+                numframes+=1
+        finally:
+            if owned:
+                start=time.perf_counter()
+                enc.close()
+                encode+=time.perf_counter()-start
+        if tracer.memory:
+            peak=max(tracemalloc.get_traced_memory()[1]-start_memory,0)
+    #(the peak memory is shared by both stages)
+    tracer.record('draw',draw,numframes,peak)
+    tracer.record('encode',encode,numframes,peak)
@@ -0,0 +1,71 @@
+def frame_index(filename,rebuild=False,save=True):
+    '''Byte offsets of the frames (data lines) of a
+    preprocessed CSV file, so that any range of frames
+    can be read by seeking straight to it.
+
+    The index is built with a single pass over the file
+    and saved next to it (filename+'.idx'). It is reused
+    while the size and modification time of the CSV file
+    do not change.
+
+    Parameters
+    ----------
+    filename: str,
+        Path and name of the preprocessed CSV file
+    rebuild: bool, optional
+        If True, rebuilds the index even if a valid one
+        is saved. (default=False)
+    save: bool, optional
+        If True, saves the index next to the CSV file.
+        If the folder is not writable, the index is only
+        kept in memory. (default=True)
+
+    Returns
+    -------
+    offsets: numpy array (frames+1), int64
+        Offset of the start of each frame, in bytes,
+        followed by the offset of the end of the last
+        frame
+
+    See Also
+    --------
+    read_frames: reads a range of frames of a preprocessed
+        trajectory file
+    '''
+    import os
+    import numpy as np
+
+    stat=os.stat(filename)
+    idxname=str(filename)+'.idx'
+    if not rebuild:
+        try:
+            with np.load(idxname) as saved:
+                if (int(saved['size'])==stat.st_size
+                        and int(saved['mtime'])==stat.st_mtime_ns):
+                    return saved['offsets']
+        except (OSError,ValueError,KeyError):
+            pass
+
+    #single pass over the file, searching for line breaks
+    starts=[]
+    pos=0
+    with open(filename,'rb') as f:
+        while True:
+            block=f.read(1<<24)
+            if not block:
+                break
+            nl=np.flatnonzero(np.frombuffer(block,dtype=np.uint8)==10)
+            starts.append(nl+pos+1)
+            pos+=len(block)
+    starts=np.concatenate(starts) if starts else np.zeros(0,dtype=np.int64)
+    starts=starts[starts<pos] #no frame after a final line break
+    #the first line is the header
+    offsets=np.append(starts,pos).astype(np.int64)
+
+    if save:
+        try:
+            with open(idxname,'wb') as f:
+                np.savez(f,offsets=offsets,size=stat.st_size,mtime=stat.st_mtime_ns)
+        except OSError:
+            pass
+    return offsets
@@ -0,0 +1,145 @@
+def fill_gaps(xyz,max_gap=12,method='linear'):
+    '''Fills the gaps of the marker trajectories (frames
+    where a marker was occluded, i.e. has NaN or infinite
+    coordinates) by interpolating between the frames
+    before and after each gap.
+
+    All gaps of all markers are found and filled at once,
+    on the array (no loop over frames or markers). Gaps at
+    the start or at the end of the trajectories, and gaps
+    longer than max_gap frames, are not filled.
+
+    Parameters
+    ----------
+    xyz: numpy array (frames x markers x 3),
+        Marker trajectories, in x,y,z coordinates
+    max_gap: int, None, optional
+        Longest gap (in frames) to be filled. If None, all
+        gaps between two valid frames are filled.
+        (default=12, i.e. 0.1 s at 120 Hz)
+    method: 'linear', 'cubic', optional
+        'linear' joins the frames before and after the gap
+        with a straight line; 'cubic' uses a cubic (Hermite)
+        curve that also follows the velocity of the marker
+        before and after the gap. (default='linear')
+
+    Returns
+    -------
+    filled: numpy array (frames x markers x 3), float
+        The trajectories with the gaps filled (a copy).
+        Markers that could not be filled are NaN
+    unfilled: numpy array (frames x markers), bool
+        True for the markers that could not be filled
+
+    See Also
+    --------
+    preprocess: fills the gaps while preprocessing (gapfill
+        argument)
+
+    Example
+    -------
+    xyz,_=vicon.read_frames('pre_processed.traj')
+    xyz,unfilled=vicon.fill_gaps(xyz,max_gap=24,method='cubic')
+    print('frames with missing markers:',np.nonzero(unfilled.any(axis=1))[0])
+    '''
+    import numpy as np
+
+    if method not in ('linear','cubic'):
+        raise ValueError("method must be 'linear' or 'cubic'")
+    xyz=np.array(xyz,dtype=float)
+    missing=~np.isfinite(xyz).all(axis=2)
+    xyz[missing]=np.nan
+    return xyz,_fill(xyz,missing,max_gap,method)
+
+def _fill(xyz,missing,max_gap,method):
+    #fills (in place) the gaps of xyz (frames x markers x 3) marked
+    #by missing (frames x markers), returning the unfilled mask
+    import numpy as np
+
+    frames,markers=missing.shape
+    unfilled=missing.copy()
+    if frames==0:
+        return unfilled
+
+    #start and end (excluded) frames of the runs of missing frames
+    #of each marker (sorted by marker, so starts and ends match)
+    edges=np.zeros((markers,frames+2),dtype=np.int8)
+    edges[:,1:-1]=missing.T
+    edges=np.diff(edges,axis=1)
+    marker,start=np.nonzero(edges==1)
+    _,end=np.nonzero(edges==-1)
+    length=end-start
+
+    #only gaps between two valid frames, not too long
+    keep=(start>0)&(end<frames)
+    if max_gap is not None:
+        keep&=length<=max_gap
+    marker,start,end,length=marker[keep],start[keep],end[keep],length[keep]
+    if len(length)==0:
+        return unfilled
+    before,after=start-1,end
+    x0,x1=xyz[before,marker],xyz[after,marker]
+    span=(after-before)[:,None]
+
+    #gap of each missing frame, and its position in the gap (0-1)
+    gap=np.repeat(np.arange(len(length)),length)
+    frame=np.arange(len(gap))-np.repeat(np.cumsum(length)-length,length)+start[gap]
+    s=((frame-before[gap])/span[gap,0])[:,None]
+
+    if method=='linear':
+        values=x0[gap]+(x1-x0)[gap]*s
+    else:
+        #velocities at both ends of the gap (from the neighbouring
+        #frame outside the gap, or the mean velocity over the gap)
+        slope=(x1-x0)/span
+        prev=np.maximum(before-1,0)
+        valid=(before>0)&~missing[prev,marker]
+        v0=np.where(valid[:,None],x0-xyz[prev,marker],slope)
+        succ=np.minimum(after+1,frames-1)
+        valid=(after<frames-1)&~missing[succ,marker]
+        v1=np.where(valid[:,None],xyz[succ,marker]-x1,slope)
+        #cubic Hermite basis
+        s2,s3=s*s,s*s*s
+        values=((2*s3-3*s2+1)*x0[gap]+(s3-2*s2+s)*span[gap]*v0[gap]
+                +(3*s2-2*s3)*x1[gap]+(s3-s2)*span[gap]*v1[gap])
+
+    xyz[frame,marker[gap]]=values
+    unfilled[frame,marker[gap]]=False
+    return unfilled
+
+class _GapFiller:
+    #fills the gaps of trajectories read in chunks, giving the same
+    #result as filling the whole array at once: the frames that may
+    #still depend on the next chunk are held back, with the frames
+    #before them needed to fill their gaps
+    def __init__(self,nmarkers,max_gap=12,method='linear'):
+        import numpy as np
+
+        if method not in ('linear','cubic'):
+            raise ValueError("method must be 'linear' or 'cubic'")
+        if max_gap is None:
+            raise ValueError('max_gap must be a number of frames to fill gaps in chunks')
+        self.max_gap=max_gap
+        self.method=method
+        self.buffer=np.zeros((0,nmarkers,3))
+        self.done=0 #frames of the buffer already returned
+
+    def fill(self,xyz,last=False):
+        #fills a chunk, returning the frames that are final (and their
+        #unfilled mask); last=True returns all the remaining frames
+        import numpy as np
+
+        self.buffer=np.concatenate([self.buffer,np.asarray(xyz,dtype=float)])
+        raw=self.buffer.copy()
+        missing=~np.isfinite(raw).all(axis=2)
+        raw[missing]=np.nan
+        unfilled=_fill(raw,missing,self.max_gap,self.method)
+        #a frame followed by max_gap+3 frames has all its gap (and the
+        #frame after it) in the buffer, or its gap is too long
+        ready=len(raw) if last else max(len(raw)-(self.max_gap+3),self.done)
+        filled,unfilled=raw[self.done:ready],unfilled[self.done:ready]
+        #the frames before a gap start at most max_gap+2 frames before it
+        keep=max(ready-(self.max_gap+2),0)
+        self.buffer=self.buffer[keep:]
+        self.done=ready-keep
+        return filled,unfilled
@@ -1,4 +1,4 @@
-def gen_detector_intro(filename_out,seconds,fps=30):
+def gen_detector_intro(filename_out,seconds,fps=30,encoder=None,tracer=None,events=None):
     ''' Generate a video of a central dot
         running for the defined number of
         seconds, and a corner rectangle
@@ -11,10 +11,24 @@ def gen_detector_intro(filename_out,seconds,fps=30):
     ----------
     filename_out: str,
         Path and name of the MP4 video file to be created
-    seconds: int,
+    seconds: float,
         Length in seconds of the video file to be created
     fps: int, optional
         Frames per second of the generated video. (default=30)
+    encoder: dict, vicon.VideoEncoder, None, optional
+        Video encoding options (see vicon.VideoEncoder, e.g.
+        {'crf':18,'preset':'fast'}), or an open VideoEncoder
+        receiving the frames, in which case filename_out is
+        not used. (default=None, i.e. libx264 at 1800 kbit/s)
+    tracer: vicon.Tracer, None, optional
+        Collects the time spent in each stage (see
+        vicon.Tracer). (default=None)
+    events: str, None, optional
+        Path and name of a CSV file where the events of the
+        clip are saved (onset of each detector
+        brightness level, with onsets from the start of
+        the clip, see vicon.sequence_events). If None, they
+        are not saved. (default=None)
     
     Returns
     -------
@@ -36,54 +50,55 @@ def gen_detector_intro(filename_out,seconds,fps=30):
     vicon.gen_detector_intro('C:\\Users\\MyUser\\Documents\\Vicon\\intro_video.mp4',15)
     '''
     import numpy as np
-    import pandas as pd
-    import matplotlib
-    matplotlib.use('TkAgg') # Needed to run on mac
-    from matplotlib import pyplot as plt
-    from mpl_toolkits.mplot3d import Axes3D
-    from matplotlib.colors import cnames
-    from matplotlib import animation
+    from matplotlib import style
     from matplotlib import patches as patches
+    from .encoder import _write_frames,_figure,_figure_frame
+    from .sequence_plan import _save_clip_events
  
-    numframes=seconds*fps
+    levels=_detector_levels(int(round(seconds*fps)),fps)
 
-    #generate figure
-    fig = plt.figure()
-    plt.style.use('dark_background')
-    fig.subplots_adjust(left=0, bottom=0, right=1, top=1, wspace=None, hspace=None)
-    fig.set_size_inches(13.66, 7.68, forward=True)
-    ax = plt.axes()
-
-    def animate(i):
+    def animate(detector):
         #plot the points
         ax.clear()
         ax.scatter(0.5,0.5, c='w', alpha=0.7)
         #set axis limits, removeing grid, setting background etc
         ax.set_xlim(0,1)
         ax.set_ylim(0,1)
-        #setting varying rectangle brightness levels for detector calibration
-        if i>12*fps:
-            detector=0.3
-        elif i>11*fps:
-            detector=0
-        elif i>10*fps:
-            detector=1
-        else:
-            detector=int(i/fps)/10
         ax.add_patch(patches.Rectangle((0.95,0.85),0.1,0.3,fill=True,fc=(detector,detector,detector),zorder=2,clip_on=False))
         #black background
         ax.patch.set_facecolor('black')
         fig.set_facecolor('black')
-        plt.axis('off')
-        plt.grid(b=None)
+        ax.axis('off')
+        ax.grid(False)
 
-    #make animation
-    ani = animation.FuncAnimation(fig, animate, frames=numframes)
+    #render and encode the frames (each brightness level is
+    #rendered once, then the same frame is encoded repeatedly)
+    def frames():
+        rendered={}
+        for detector in levels:
+            if detector not in rendered:
+                animate(detector)
+                rendered[detector]=np.ascontiguousarray(_figure_frame(fig)[:,:,:3])
+            yield rendered[detector]
 
-    #setting up animation file
-    Writer = animation.writers['ffmpeg']
-    writer = animation.FFMpegWriter(fps=fps,metadata=dict(artist='NeuroMat'),bitrate=1800,extra_args=['-vcodec','libx264'])
+    #generate figure (the style is only set while rendering)
+    with style.context('dark_background'):
+        fig = _figure()
+        ax = fig.add_subplot(111)
+        _write_frames(frames(),encoder,filename_out,fps,tracer)
+    if events is not None:
+        _save_clip_events(events,'intro','gen_detector_intro',len(levels),fps)
 
-    #save animation
-    ani.save(filename_out, writer=writer)
-    plt.close()
+def _detector_levels(numframes,fps=30):
+    #brightness of the detector rectangle in each frame of the intro
+    #(varying levels for detector calibration)
+    def brightness(i):
+        if i>12*fps:
+            return 0.3
+        elif i>11*fps:
+            return 0
+        elif i>10*fps:
+            return 1
+        else:
+            return int(i/fps)/10
+    return [brightness(i) for i in range(numframes)]
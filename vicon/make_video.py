@@ -1,15 +1,17 @@
 def make_video(filename_in,filename_out,elevation_angle=0,
                azimuth_angle=0,framerange=None,fps=30,edgetype='edge',
-               axislims=None):
+               axislims=None,backend='matplotlib',encoder=None,tracer=None,
+               resample=False,units='frames',events=None):
     ''' Uses pre-processed VICON data to
         generate a video of the motion at
         a specified viewing angle
 
     Parameters
     ----------
-    filename_in: str,
-        Path and name of the preprocessed CSV from the VICON
-        acquisition (see vicon.preprocess function)
+    filename_in: str, vicon.Trajectory,
+        Path and name of the preprocessed CSV or binary
+        trajectory file from the VICON acquisition (see
+        vicon.preprocess function), or its Trajectory
     filename_out: str,
         Path and name of the MP4 video file to be created
     elevation_angle: float, optional
@@ -18,7 +20,9 @@ def make_video(filename_in,filename_out,elevation_angle=0,
         Azimuth (sideways) viewing angle, in degrees. (default=0)
     framerange: int, list (2 elements), tuple (2 elements), optional
         Range of frames from the input file to be used to
-        generate the video
+        generate the video: number of frames from the
+        start (int) or first and end (excluded) frames
+        (or seconds, see units)
     fps: int, optional
         Frames per second of the generated video. (default=30)
     edgetype: 'edge', None
@@ -29,10 +33,45 @@ def make_video(filename_in,filename_out,elevation_angle=0,
         generated plot will range from -x to x, -y to y and
         -z to z. If None, it will obtain the limits from the
         data (default).
+    backend: 'matplotlib', 'raster', optional
+        Rendering backend. All frames are projected at once
+        (see vicon.project_views); 'matplotlib' draws the
+        projected points of each frame with matplotlib,
+        'raster' draws them directly into the video frames,
+        which is much faster. (default='matplotlib')
+    encoder: dict, vicon.VideoEncoder, None, optional
+        Video encoding options (see vicon.VideoEncoder, e.g.
+        {'crf':18,'preset':'fast'}), or an open VideoEncoder
+        receiving the frames, in which case filename_out is
+        not used. (default=None, i.e. libx264 at 1800 kbit/s)
+    tracer: vicon.Tracer, None, optional
+        Collects the time spent in each stage (see
+        vicon.Tracer). (default=None)
+    resample: bool, float, optional
+        If True, the trajectories are resampled from the
+        capture rate (from the binary trajectory file) to
+        fps (see vicon.resample), so that the video plays
+        at the speed of the movement and only the frames
+        shown are rendered. For files without a capture
+        rate (CSV files), the rate can be given instead, in
+        Hz. If False, each captured frame is a video frame.
+        (default=False)
+    units: 'frames', 'seconds', optional
+        Units of framerange. Seconds are converted to frames
+        with the capture rate (see resample). (default='frames')
+    events: str, None, optional
+        Path and name of a CSV file where the events of the
+        clip are saved (source file and frame window, with onsets from the start of
+        the clip, see vicon.sequence_events). If None, they
+        are not saved. (default=None)
     
     Returns
     -------
-    (none) (output video is saved in the specified filename_out)
+    trajectory: vicon.Trajectory,
+        The frames of filename_in shown in the video (after
+        resampling, before centering), as a view on the file
+        data if possible (output video is saved in the
+        specified filename_out)
 
     See Also
     --------
@@ -47,104 +86,38 @@ def make_video(filename_in,filename_out,elevation_angle=0,
     -------
     vicon.make_video('C:\\Users\\MyUser\\Documents\\Vicon\\pre_processed.csv',
         'C:\\Users\\MyUser\\Documents\\Vicon\\video.mp4',framerange=[500,2500])
+    vicon.make_video('C:\\Users\\MyUser\\Documents\\Vicon\\pre_processed.traj',
+        'C:\\Users\\MyUser\\Documents\\Vicon\\video.mp4',framerange=[4,20],
+        units='seconds',resample=True)
     '''
-    import numpy as np
-    import pandas as pd
-    import matplotlib
-    matplotlib.use('TkAgg') # Needed to run on mac
-    from matplotlib import pyplot as plt
-    from mpl_toolkits.mplot3d import Axes3D
-    from matplotlib.colors import cnames
-    from matplotlib import animation
+    from .resample import _read_trajectories
+    from .trajectory import Trajectory
+    from .projection import project_views,_center,_render_points
+    from .skeleton import skeleton_edges
+    from .tracing import _get_tracer
+    from .sequence_plan import _save_clip_events,_source_name
 
+    tracer=_get_tracer(tracer)
+    with tracer.capture():
+        #read data (binary trajectory files are memory-mapped),
+        #resampled to the video frame rate if requested
+        xyz,header=_read_trajectories(filename_in,framerange,fps,resample,units,tracer)
+        shown=Trajectory(xyz,header['rate'],header['markers'])
 
-    #definition of links between point-light displays, forming arms, legs, head etc
-    if edgetype==None:
-        links=[]
-    else:
-        links=((0,1),(0,2),(0,4),(1,2),(1,3),(4,5),(4,10),(5,6),(5,18),(5,20),(6,7),(6,14),(7,8),(8,9),(10,11),(10,14),(11,12),(12,13),(14,15),(15,16),(16,17),(18,19),(19,5))
+        #definition of links between point-light displays, forming arms, legs, head etc
+        edges=skeleton_edges(None if edgetype==None else 'original',xyz.shape[1])
 
-    #function to check if a pair is linked or not
-    def islinked(n1,n2):
-        for _ in range(len(links)):
-            if (n1,n2)==(links[i][0],links[i][1]):
-                        return True
-        return False
+        #centering, and calculating the axis limits
+        with tracer.stage('center',len(xyz)):
+            xyz,lims=_center(xyz,axislims)
 
-    #read data
-    if type(framerange)==int:
-        data = pd.read_csv(filename_in, nrows=framerange)
-    if type(framerange)==list or type(framerange)==tuple:
-        columnnames=pd.read_csv(filename_in, nrows=1)
-        data = pd.read_csv(filename_in, skiprows=framerange[0], nrows=framerange[1]-framerange[0], header=None)
-        data.columns=columnnames.columns
-    else:
-        data = pd.read_csv(filename_in)
-    data.replace([np.inf, -np.inf], np.nan).dropna()
-    xdata=data.filter(['X','X.1','X.2','X.3','X.4','X.5','X.6','X.7','X.8','X.9','X.10','X.11','X.12','X.13','X.14','X.15','X.16','X.17','X.18','X.19'],axis=1)
-    ydata=data.filter(['Y','Y.1','Y.2','Y.3','Y.4','Y.5','Y.6','Y.7','Y.8','Y.9','Y.10','Y.11','Y.12','Y.13','Y.14','Y.15','Y.16','Y.17','Y.18','Y.19'],axis=1)
-    zdata=data.filter(['Z','Z.1','Z.2','Z.3','Z.4','Z.5','Z.6','Z.7','Z.8','Z.9','Z.10','Z.11','Z.12','Z.13','Z.14','Z.15','Z.16','Z.17','Z.18','Z.19'],axis=1)
-    
-    numframes=len(data.index)
-
-    #centering
-    xdata=xdata-xdata.mean().mean()
-    ydata=ydata-ydata.mean().mean()
-    zdata=zdata-zdata.mean().mean()
-
-    #calculate the axis limits
-    if type(axislims)==tuple or type(axislims)==list:
-        xmax,xmin=axislims[0],-axislims[0]
-        ymax,ymin=axislims[1],-axislims[1]
-        zmax,zmin=axislims[2],-axislims[2]
-    else:
-        a=max(np.absolute(xdata.min().min()),np.absolute(xdata.max().max()))
-        xmin,xmax=-(a+100),a+100
-        b=max(np.absolute(ydata.min().min()),np.absolute(ydata.max().max()))
-        ymin,ymax=-(b+100),b+100
-        c=max(np.absolute(zdata.min().min()),np.absolute(zdata.max().max()))
-        zmin,zmax=-c,c
-
-    #generate figure
-    fig = plt.figure()
-    plt.style.use('dark_background')
-    fig.subplots_adjust(left=0, bottom=0, right=1, top=1, wspace=None, hspace=None)
-    fig.set_size_inches(13.66, 7.68, forward=True)
-    ax = plt.axes(projection='3d')
-
-    def animate(i):
-        xline=xdata.loc[i]
-        yline=ydata.loc[i]
-        zline=zdata.loc[i]
-        #plot the points
-        ax.clear()
-        ax.scatter3D(xline, yline,zline, c='w', alpha=0.7)
-        #plot the sticks
-        for name1 in range(20):
-            for name2 in range(20):
-                if islinked(name1,name2):
-                    x=(xdata.iloc[i,name1],xdata.iloc[i,name2])
-                    y=(ydata.iloc[i,name1],ydata.iloc[i,name2])
-                    z=(zdata.iloc[i,name1],zdata.iloc[i,name2])
-                    ax.plot3D(x,y,z,'w-',alpha=0.5)
-        ax.view_init(elevation_angle,azimuth_angle)
-        
-        #set axis limits, removeing grid, setting background etc
-        ax.set_xlim(xmin,xmax)
-        ax.set_ylim(ymin,ymax)
-        ax.set_zlim(zmin,zmax)
-        ax.patch.set_facecolor('black')
-        fig.set_facecolor('black')
-        plt.axis('off')
-        plt.grid(b=None)
-
-    #make animation
-    ani = animation.FuncAnimation(fig, animate, frames=numframes)
-
-    #setting up animation file
-    Writer = animation.writers['ffmpeg']
-    writer = animation.FFMpegWriter(fps=fps,metadata=dict(artist='NeuroMat'),bitrate=1800,extra_args=['-vcodec','libx264'])
+        #project all frames at once to pixel coordinates
+        with tracer.stage('project',len(xyz)):
+            points=project_views(xyz,[(elevation_angle,azimuth_angle)],lims)[0]
 
-    #save animation and close figure
-    ani.save(filename_out, writer=writer)
-    plt.close()
+        #render and encode the frames
+        _render_points(points,edges,filename_out,fps,encoder,backend,tracer=tracer)
+    if events is not None:
+        _save_clip_events(events,'trial','make_video',len(points),fps,
+                          source=_source_name(filename_in),window=header['window'])
+    return shown
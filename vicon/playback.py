@@ -0,0 +1,254 @@
+class Playback:
+    '''Real-time playback of point-light stimuli: yields
+    ready-to-display frames at a fixed rate, instead of
+    encoding a video file, for closed-loop experiments
+    where the stimulus is chosen on the fly.
+
+    The trajectories are read, centered, scrambled and
+    projected as in vicon.render_batch, and the frames are
+    drawn by vicon.rasterize when they are requested. The
+    view and the detector brightness can be changed while
+    playing (the following frames are projected again).
+
+    When iterated with realtime=True, each frame is
+    yielded at its due time (first frame + i/fps). If a
+    frame is already late by more than one frame period
+    (e.g. the consumer was slow), it is dropped without
+    being drawn, and the playback continues with the frame
+    due at that time. The render time and the lateness of
+    each frame, and the number of dropped frames, are kept
+    in stats.
+
+    Parameters
+    ----------
+    trajectory: str, vicon.Trajectory,
+        Preprocessed CSV or binary trajectory file, or a
+        Trajectory
+    fps: float, optional
+        Frames per second of the playback. (default=30)
+    elevation_angle, azimuth_angle: float, optional
+        Viewing angles, in degrees. (default=0)
+    scrambletype: str, None, optional
+        None for the original motion, or the type of
+        scrambling (see vicon.scramble). (default=None)
+    seed: int, numpy Generator, None, optional
+        Seed of the scrambling. (default=None)
+    links: 2D list, 2D tuple, numpy array (E x 2), None, 'original', optional
+        Pairs of linked markers (see vicon.skeleton_edges).
+        (default='original' if not scrambled, else None)
+    detector: float (0-1), None, optional
+        Brightness of the detector corner, or None for no
+        corner. (default=None)
+    detector_loc: list (2 elements), tuple (2 elements), None, optional
+        Detector location, in y,z coordinates (see
+        vicon.scrambled_video). (default=None)
+    axislims: list (3 elements), tuple (3 elements), None, optional
+        Axis limits, in x,y,z coordinates (see
+        vicon.make_video). If None, they are obtained from
+        the data (before centering if scrambled, as in
+        vicon.scrambled_video). (default=None)
+    framerange: int, list (2 elements), tuple (2 elements), None, optional
+        Range of frames (or seconds, see units) to be
+        played. If None, plays all frames. (default=None)
+    resample: bool, float, optional
+        If True, the trajectories are resampled from the
+        capture rate to fps (see vicon.make_video), or from
+        the given rate, in Hz. (default=False)
+    units: 'frames', 'seconds', optional
+        Units of framerange. (default='frames')
+    output: 'frames', 'points', optional
+        'frames' yields RGB frames (height x width x 3,
+        uint8; the same buffer is reused for every frame);
+        'points' yields the projected points of each frame
+        (markers x 3: pixel column, row and depth), to be
+        drawn by the caller. (default='frames')
+    realtime: bool, optional
+        If True, the frames are yielded at fps, dropping
+        late frames; if False, as fast as they are drawn
+        (e.g. for tests). (default=True)
+    tracer: vicon.Tracer, None, optional
+        Collects the time spent in the reading, centering,
+        scrambling and projection stages, and in drawing
+        the played frames (see vicon.Tracer). (default=None)
+
+    Example
+    -------
+    walk=vicon.Trajectory.load('pre_processed.traj')
+    playback=vicon.Playback(walk,azimuth_angle=30,framerange=[4,10],units='seconds',
+        resample=True)
+    for frame in playback:
+        window.show(frame) #e.g. a PsychoPy or pyglet texture
+        if response():
+            playback.set_view(0,90)
+    print(playback.summary())
+
+    (headless: summary=playback.run(vicon.MemorySink()))
+    '''
+    def __init__(self,trajectory,fps=30,elevation_angle=0,azimuth_angle=0,scrambletype=None,
+                 seed=None,links='original',detector=None,detector_loc=None,axislims=None,
+                 framerange=None,resample=False,units='frames',output='frames',realtime=True,
+                 tracer=None):
+        from .resample import _read_trajectories
+        from .projection import _center
+        from .scramble import scramble
+        from .skeleton import skeleton_edges
+        from .tracing import _get_tracer
+
+        if output not in ('frames','points'):
+            raise ValueError("output must be 'frames' or 'points'")
+        self.fps=fps
+        self.output=output
+        self.realtime=realtime
+        self.detector=detector
+        self.detector_loc=detector_loc
+        self.stats={'render':[],'lateness':[],'dropped':0}
+        self._tracer=_get_tracer(tracer)
+
+        tracer=self._tracer
+        with tracer.capture():
+            xyz,self.header=_read_trajectories(trajectory,framerange,fps,resample,units,tracer)
+            with tracer.stage('center',len(xyz)):
+                xyz,self.lims=_center(xyz,axislims,scrambled=scrambletype is not None)
+            if scrambletype is not None:
+                with tracer.stage('scramble',len(xyz)):
+                    xyz=scramble(xyz,scrambletype,seed)
+        if type(links)==str and scrambletype is not None:
+            links=None
+        self.xyz=xyz
+        self.edges=skeleton_edges(links,xyz.shape[1])
+        self._position=0 #next frame to be played
+        self.set_view(elevation_angle,azimuth_angle)
+
+    def set_view(self,elevation_angle,azimuth_angle):
+        '''Changes the viewing angles, from the next frame on'''
+        from .projection import project_views,_detector_corners
+
+        with self._tracer.capture():
+            remaining=self.xyz[self._position:]
+            with self._tracer.stage('project',len(remaining)):
+                self.points=project_views(remaining,[(elevation_angle,azimuth_angle)],
+                                          self.lims)[0]
+                corners=_detector_corners(self.detector_loc,self.lims)
+                self.patch=project_views(corners,[(elevation_angle,azimuth_angle)],
+                                         self.lims)[0,:,:2]
+        self.view=(elevation_angle,azimuth_angle)
+        self._offset=self._position #frame of points[0]
+        self._frames=None
+
+    def set_detector(self,detector):
+        '''Changes the brightness of the detector corner (0-1,
+        or None for no corner), from the next frame on'''
+        self.detector=detector
+        self._frames=None
+
+    def __len__(self):
+        return len(self.xyz)
+
+    def __iter__(self):
+        import time
+        from .raster import rasterize
+
+        clock=time.perf_counter
+        period=1/self.fps
+        start=None
+        drawn=0.0
+        numframes=0
+        try:
+            while self._position<len(self.xyz):
+                i=self._position
+                if start is None:
+                    start=clock()-i*period
+                due=start+i*period
+                #frames whose time has passed are dropped (not drawn)
+                if self.realtime:
+                    late=int((clock()-due)/period)
+                    if late>=1:
+                        late=min(late,len(self.xyz)-i)
+                        self.stats['dropped']+=late
+                        self._position+=late
+                        self._frames=None
+                        continue
+
+                before=clock()
+                k=i-self._offset
+                if self.output=='points':
+                    frame=self.points[k]
+                else:
+                    if self._frames is None:
+                        #(drawing restarts after a change or a drop)
+                        self._frames=rasterize(self.points[k:],self.edges,patch=self.patch,
+                                               patch_level=self.detector)
+                    frame=next(self._frames)
+                rendered=clock()
+                drawn+=rendered-before
+                numframes+=1
+
+                if self.realtime and due>rendered:
+                    time.sleep(due-rendered)
+                self.stats['render'].append(rendered-before)
+                self.stats['lateness'].append(max(clock()-due,0.0))
+                self._position+=1
+                yield frame
+        finally:
+            self._tracer.record('draw',drawn,numframes)
+
+    def run(self,sink):
+        '''Plays all the (remaining) frames into a sink: an
+        object with a write(frame) method (e.g. a
+        vicon.MemorySink or an open vicon.VideoEncoder) or a
+        function. Returns the summary (see Playback.summary)'''
+        write=sink.write if hasattr(sink,'write') else sink
+        for frame in self:
+            write(frame)
+        return self.summary()
+
+    def summary(self):
+        '''Timing of the played frames: dict with 'frames'
+        (played), 'dropped', 'render_mean' and 'render_max'
+        (drawing time, in seconds), 'lateness_mean' and
+        'lateness_max' (delay after the due time, in
+        seconds)'''
+        import numpy as np
+
+        render=np.array(self.stats['render'])
+        lateness=np.array(self.stats['lateness'])
+        mean=lambda x: float(x.mean()) if len(x) else None
+        top=lambda x: float(x.max()) if len(x) else None
+        return {'frames':len(render),'dropped':self.stats['dropped'],
+                'render_mean':mean(render),'render_max':top(render),
+                'lateness_mean':mean(lateness),'lateness_max':top(lateness)}
+
+class MemorySink:
+    '''Frame sink keeping the played frames in memory,
+    with the time each one was received, to run and test
+    vicon.Playback without a display.
+
+    Parameters
+    ----------
+    maxframes: int, None, optional
+        Number of frames kept (the first ones); the
+        following frames are only counted and timed. If
+        None, keeps all frames. (default=None)
+
+    Example
+    -------
+    sink=vicon.MemorySink()
+    vicon.Playback('walk.traj',framerange=60).run(sink)
+    print(len(sink),np.diff(sink.times))
+    '''
+    def __init__(self,maxframes=None):
+        self.maxframes=maxframes
+        self.frames=[]
+        self.times=[]
+
+    def write(self,frame):
+        '''Receives one frame (a copy is kept)'''
+        import time
+        import numpy as np
+
+        self.times.append(time.perf_counter())
+        if self.maxframes is None or len(self.frames)<self.maxframes:
+            self.frames.append(np.array(frame))
+
+    def __len__(self):
+        return len(self.times)
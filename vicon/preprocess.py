@@ -1,17 +1,21 @@
-def preprocess(filename_in,filename_out,center=None):
+def preprocess(filename_in,filename_out,center=None,chunksize=10000,progress=None,
+               tracer=None,gapfill=None,max_gap=12):
     '''Reads a CSV file from VICON Motion Capture and
     creates a new CSV file only with the trajectories,
-    changing to another reference frame (mean, rotating)
-    if convenient.
+    filling the gaps of occluded markers and changing to
+    another reference frame (mean, rotating) if convenient.
 
     Parameters
     ----------
-    filename_in: str,
+    filename_in: str, vicon.Trajectory,
         Path and name of the original CSV from the VICON
-        acquisition
-    filename_out: str,
+        acquisition, or its Trajectory
+    filename_out: str, None,
         Path and name of the VICON CSV file to be generated
-        after processing
+        after processing. If it ends with '.traj', a binary
+        trajectory file is generated instead (see
+        vicon.save_trajectory), which is faster to read. If
+        None, the result is returned as a Trajectory
     center: str, optional
         The option to re-reference the viewing perspective:
         options:
@@ -23,13 +27,46 @@ def preprocess(filename_in,filename_out,center=None):
                 mean, hence centralizing the acquisition data
                 in the screen
             center=None: no effect (default)
+    chunksize: int, optional
+        Number of frames read, processed and saved at a
+        time. The memory used depends only on chunksize,
+        not on the length of the acquisition.
+        (default=10000)
+    progress: function, None, optional
+        Called after each chunk with a dict with the keys
+        'filename_in', 'frames' (frames done) and 'done'
+        (True on the last call). If None, the frames done
+        are printed. (default=None)
+    tracer: vicon.Tracer, None, optional
+        Collects the time spent in each stage (see
+        vicon.Tracer). (default=None)
+    gapfill: 'linear', 'cubic', None, optional
+        If given, the gaps of the markers (NaN or infinite
+        coordinates) are filled by interpolation (see
+        vicon.fill_gaps) before changing the reference
+        frame. If None, the gaps are kept. (default=None)
+    max_gap: int, optional
+        Longest gap (in frames) to be filled. (default=12)
 
     Returns
     -------
-    (none) (output file is saved in the specified filename_out)
+    summary: dict,
+        'filename_in', 'filename_out', 'frames' (number of
+        frames), 'seconds' (processing time) and 'unfilled'
+        (list of the frames with markers that could not be
+        filled, or None if gapfill is None). The output
+        file is saved in the specified filename_out; if it
+        is None, 'trajectory' is the vicon.Trajectory of
+        the result
 
     See Also
     --------
+    fill_gaps: fills the gaps of occluded markers
+    reframe: changes the reference frame of the trajectories
+    read_vicon: reads the Trajectories block of a VICON CSV
+        file in chunks
+    preprocess_batch: preprocesses many files in parallel
+    load_trajectory: memory-maps a binary trajectory file
     make_video: uses pre-processed VICON data to generate
         video of the movement at specified viewing angle
     scrambled_video: uses pre-processed VICON data to produce
@@ -41,68 +78,92 @@ def preprocess(filename_in,filename_out,center=None):
     vicon.preprocess('C:\\Users\\MyUser\\Documents\\Vicon\\acquisition.csv',
         'C:\\Users\\MyUser\\Documents\\Vicon\\preprocessed.csv',center='shoulders')
     '''
-    import numpy as np
-    import pandas as pd
+    import time
+    from .tracing import _get_tracer
 
-    #reading data
-    file = pd.read_csv(filename_in,header=None,sep='\n')
-    i=file[file[0]=='Trajectories']
-    skip_lines=i.index[0]+3
-    idx_data=pd.read_csv(filename_in,skiprows=skip_lines+1,nrows=1)
-    data = pd.read_csv(filename_in,skiprows=skip_lines+3,header=None)
-    data.columns=idx_data.columns
+    start=time.perf_counter()
+    if progress is None:
+        progress=_print_progress
+    tracer=_get_tracer(tracer)
+    with tracer.capture():
+        numframes,unfilled,trajectory=_preprocess(filename_in,filename_out,center,chunksize,
+                                                  progress,tracer,gapfill,max_gap)
+    progress({'filename_in':filename_in,'frames':numframes,'done':True})
+    summary={'filename_in':filename_in,'filename_out':filename_out,'frames':numframes,
+             'seconds':time.perf_counter()-start,'unfilled':unfilled}
+    if filename_out is None:
+        summary['trajectory']=trajectory
+    return summary
 
-    numframes=len(data.index)
-    xdata=data.filter(['X','X.1','X.2','X.3','X.4','X.5','X.6','X.7','X.8','X.9','X.10','X.11','X.12','X.13','X.14','X.15','X.16','X.17','X.18','X.19'],axis=1)
-    ydata=data.filter(['Y','Y.1','Y.2','Y.3','Y.4','Y.5','Y.6','Y.7','Y.8','Y.9','Y.10','Y.11','Y.12','Y.13','Y.14','Y.15','Y.16','Y.17','Y.18','Y.19'],axis=1)
-    zdata=data.filter(['Z','Z.1','Z.2','Z.3','Z.4','Z.5','Z.6','Z.7','Z.8','Z.9','Z.10','Z.11','Z.12','Z.13','Z.14','Z.15','Z.16','Z.17','Z.18','Z.19'],axis=1)
+def _preprocess(filename_in,filename_out,center,chunksize,progress,tracer,gapfill=None,
+                max_gap=12):
+    import numpy as np
+    import pandas as pd
+    from .read_vicon import read_vicon
+    from .reframe import reframe
+    from .trajectory_file import TrajectoryWriter
+    from .trajectory import Trajectory,_TrajectoryBuffer
+    from .gapfill import _GapFiller
 
-    theta=np.zeros(numframes)
-    theta2=np.zeros(numframes)
-    if center=='shoulder':
-        #coordinate translation to X5 (neck)
-        print("axis translation")
-        for i in range(numframes):
-            xdata.loc[i]=xdata.loc[i]-xdata.loc[i,'X.4']
-            ydata.loc[i]=ydata.loc[i]-ydata.loc[i,'Y.4']
-            zdata.loc[i]=zdata.loc[i]-zdata.loc[i,'Z.4']
-            if i%100==0:
-                print("frames done:"+str(i))
+    #reading data (one chunk at a time)
+    if isinstance(filename_in,Trajectory):
+        header={'rate':filename_in.rate,'markers':filename_in.markers}
+        nmarkers=filename_in.nmarkers
+        chunks=(np.asarray(filename_in.xyz[k:k+chunksize],dtype=float)
+                for k in range(0,filename_in.numframes,chunksize))
+    else:
+        header,chunks=read_vicon(filename_in,chunksize=chunksize)
+        nmarkers=len(header['markers'])
+    suffixes=['']+['.'+str(k) for k in range(1,nmarkers)]
+    columns=[axis+k for axis in ('X','Y','Z') for k in suffixes]
 
-        #coordinate rotation around z-axis to X6 (left shoulder) direction
-        print("axis rotation")
-        for i in range(numframes):
-            #calulate new axis angle
-            if np.absolute(ydata.loc[i,'Y.6'])<10:
-                theta[i]=np.pi/2
-            else:
-                theta[i]=np.arctan(-xdata.loc[i,'X.6']/(ydata.loc[i,'Y.6'])) #1st and 4th quadrant
-            if i>0:
-                if (theta[i]<=0 and theta[i-1]>=0) and theta[i-1]<np.pi: #2nd quadrant
-                    theta[i]=np.pi-np.absolute(theta[i])
-                elif theta[i]>0 and (theta[i-1]>=3 and theta[i]<=1.6): #3rd quadrant
-                    theta[i]=np.pi+theta[i]
-            #coordinate rotation
-            theta2[i]=-theta[i]
-            a , b = xdata.loc[i].values*np.cos(theta2[i])-ydata.loc[i].values*np.sin(theta2[i]) , xdata.loc[i].values*np.sin(theta2[i])+ydata.loc[i].values*np.cos(theta2[i])
-            xdata.loc[i] , ydata.loc[i] = a , b
-            #display progress    
-            if i%100==0:
-                print("frames done:"+str(i))
-    elif center=='mean':
-        #coordinate translation to mean
-        print("axis translation")
-        for i in range(numframes):
-            xdata.loc[i]=xdata.loc[i]-xdata.loc[i].mean()
-            ydata.loc[i]=ydata.loc[i]-ydata.loc[i].mean()
-            zdata.loc[i]=zdata.loc[i]-zdata.loc[i].mean()
-            if i%100==0:
-                print("frames done:"+str(i))
+    numframes=0
+    prev_theta=None
+    #the gaps are filled across chunks (the last frames of a chunk
+    #are held back until the next one is read)
+    filler=None if gapfill is None else _GapFiller(nmarkers,max_gap,gapfill)
+    unfilled=[]
+    binary=filename_out is None or str(filename_out).lower().endswith('.traj')
+    if filename_out is None:
+        out=_TrajectoryBuffer(nmarkers=nmarkers,rate=header['rate'],markers=header['markers'])
+    elif binary:
+        out=TrajectoryWriter(filename_out,nmarkers=nmarkers,rate=header['rate'],markers=header['markers'])
     else:
-        pass
+        out=open(filename_out,'w',newline='')
+    with out:
+        while True:
+            with tracer.stage('read') as record:
+                xyz=next(chunks,None)
+                record['frames']=0 if xyz is None else len(xyz)
+            last=xyz is None
+            #filling the gaps
+            if filler is not None:
+                with tracer.stage('filter',record['frames']):
+                    xyz,missing=filler.fill(np.zeros((0,nmarkers,3)) if last else xyz,last)
+                unfilled.extend((np.nonzero(missing.any(axis=1))[0]+numframes).tolist())
+            if xyz is not None and len(xyz)>0:
+                #changing reference frame
+                if center=='shoulder' or center=='mean':
+                    with tracer.stage('center',len(xyz)):
+                        xyz,prev_theta=reframe(xyz,center=center,prev_theta=prev_theta,return_theta=True)
+                #appending to new file
+                with tracer.stage('write',len(xyz)):
+                    if binary:
+                        out.append(xyz)
+                    else:
+                        newdata=pd.DataFrame(np.concatenate([xyz[:,:,0],xyz[:,:,1],xyz[:,:,2]],axis=1),columns=columns)
+                        newdata.to_csv(out,index=False,header=numframes==0)
+                numframes+=len(xyz)
+                progress({'filename_in':filename_in,'frames':numframes,'done':False})
+            if last:
+                break
+        if numframes==0 and not binary:
+            pd.DataFrame(columns=columns).to_csv(out,index=False)
+    trajectory=out.trajectory() if filename_out is None else None
+    return numframes,None if filler is None else unfilled,trajectory
 
-    #making new csv
-    print("saving file")
-    newdata=pd.concat([xdata,ydata,zdata],axis=1)
-    newdata.to_csv(filename_out,index=False)
-    print("done")
+def _print_progress(status):
+    if status['done']:
+        print("done")
+    else:
+        print("frames done:"+str(status['frames']))
@@ -0,0 +1,183 @@
+def preprocess_batch(files,output_dir=None,suffix='.traj',center=None,chunksize=10000,
+                     processes=None,progress=None,manifest=None,force=False,gapfill=None,
+                     max_gap=12):
+    '''Preprocesses many CSV files from VICON Motion
+    Capture (see vicon.preprocess), one file per worker
+    process, skipping the files whose output is already
+    up to date.
+
+    An output is up to date if it is newer than its
+    input file. If a manifest file is given, the digest
+    (sha256) of each input file and the center and gap
+    filling options are recorded in it, and an output is up to date only
+    if they did not change since it was generated.
+
+    Parameters
+    ----------
+    files: str, list of str,
+        Folder with the original CSV files (all the '.csv'
+        files in it), glob pattern (e.g. 'study/*/walk*.csv')
+        or list of file names
+    output_dir: str, None, optional
+        Folder of the preprocessed files. If None, each
+        preprocessed file is saved next to its input file.
+        (default=None)
+    suffix: str, optional
+        The preprocessed file names are the input file
+        names, without extension, followed by suffix. If it
+        ends with '.traj', binary trajectory files are
+        generated. (default='.traj')
+    center: str, None, optional
+        The option to re-reference the viewing perspective
+        ('shoulder', 'mean' or None, see vicon.preprocess).
+        (default=None)
+    chunksize: int, optional
+        Number of frames processed at a time in each file.
+        (default=10000)
+    processes: int, None, optional
+        Number of worker processes. If None, uses the number
+        of CPUs; if 1, processes the files one after
+        another. (default=None)
+    progress: function, None, optional
+        Called each time a file is finished with its summary
+        (see Returns) and the keys 'completed' and 'total'
+        (number of files). If None, nothing is printed.
+        (default=None)
+    manifest: str, None, optional
+        Path and name of the JSON manifest file. (default=None)
+    force: bool, optional
+        If True, processes all files, even the up to date
+        ones. (default=False)
+    gapfill: 'linear', 'cubic', None, optional
+        Interpolation of the gaps of the markers (see
+        vicon.preprocess). If None, the gaps are kept.
+        (default=None)
+    max_gap: int, optional
+        Longest gap (in frames) to be filled. (default=12)
+
+    Returns
+    -------
+    summary: list of dict,
+        For each input file (in the given order):
+            'filename_in', 'filename_out'
+            'status': 'done', 'skipped' or 'failed'
+            'frames': number of frames (None if skipped or failed)
+            'seconds': processing time
+            'unfilled': frames with markers that could not
+                be filled (None if not filled, skipped or failed)
+            'error': error message (failed files only)
+
+    See Also
+    --------
+    preprocess: reads a CSV file from VICON Motion Capture and
+        creates a new CSV file only with the trajectories
+
+    Example
+    -------
+    summary=vicon.preprocess_batch('C:\\Users\\MyUser\\Documents\\Vicon\\study',
+        output_dir='C:\\Users\\MyUser\\Documents\\Vicon\\preprocessed',
+        center='shoulder',progress=print)
+    '''
+    import os
+    import glob
+    import json
+    from concurrent.futures import ProcessPoolExecutor,as_completed
+    from .cache import _file_digest
+
+    #list of input files
+    if isinstance(files,(list,tuple)):
+        files=list(files)
+    elif os.path.isdir(files):
+        files=sorted(glob.glob(os.path.join(files,'*.csv')))
+        #outputs saved in the same folder are not inputs
+        files=[f for f in files if not f.endswith(suffix)]
+    else:
+        files=sorted(glob.glob(files))
+
+    outputs=[]
+    for filename_in in files:
+        name=os.path.splitext(os.path.basename(filename_in))[0]+suffix
+        folder=os.path.dirname(filename_in) if output_dir is None else output_dir
+        filename_out=os.path.join(folder,name)
+        if os.path.abspath(filename_out)==os.path.abspath(filename_in):
+            raise ValueError('the output would overwrite the input file '+str(filename_in))
+        outputs.append(filename_out)
+    if output_dir is not None:
+        os.makedirs(output_dir,exist_ok=True)
+
+    records={}
+    if manifest is not None and os.path.exists(manifest):
+        with open(manifest) as f:
+            records=json.load(f)
+
+    #checking which outputs are up to date
+    summary=[None]*len(files)
+    todo=[]
+    for k,(filename_in,filename_out) in enumerate(zip(files,outputs)):
+        record=None
+        if manifest is not None:
+            record={'input':os.path.abspath(filename_in),'digest':_file_digest(filename_in),
+                    'center':center,'gapfill':gapfill,'max_gap':max_gap}
+        if not force and os.path.exists(filename_out):
+            if manifest is not None:
+                uptodate=records.get(os.path.abspath(filename_out))==record
+            else:
+                uptodate=os.path.getmtime(filename_out)>=os.path.getmtime(filename_in)
+            if uptodate:
+                summary[k]={'filename_in':filename_in,'filename_out':filename_out,
+                            'status':'skipped','frames':None,'seconds':0.0,'unfilled':None}
+                continue
+        todo.append((k,filename_in,filename_out,record))
+
+    completed=0
+    def finish(k,result):
+        nonlocal completed
+        summary[k]=result
+        completed+=1
+        if progress is not None:
+            progress(dict(result,completed=completed,total=len(files)))
+
+    for k in range(len(files)):
+        if summary[k] is not None:
+            finish(k,summary[k])
+
+    #processing the remaining files
+    jobs=[(filename_in,filename_out,center,chunksize,gapfill,max_gap) for _,filename_in,filename_out,_ in todo]
+    if processes==1:
+        for (k,_,_,_),job in zip(todo,jobs):
+            finish(k,_preprocess_file(job))
+    elif jobs:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures={pool.submit(_preprocess_file,job):k for (k,_,_,_),job in zip(todo,jobs)}
+            for future in as_completed(futures):
+                finish(futures[future],future.result())
+
+    if manifest is not None:
+        for k,_,filename_out,record in todo:
+            if summary[k]['status']=='done':
+                records[os.path.abspath(filename_out)]=record
+            else:
+                records.pop(os.path.abspath(filename_out),None)
+        with open(manifest,'w') as f:
+            json.dump(records,f,indent=1)
+    return summary
+
+def _preprocess_file(job):
+    #preprocesses one file (run in a worker process)
+    import os
+    import time
+    from .preprocess import preprocess
+
+    filename_in,filename_out,center,chunksize,gapfill,max_gap=job
+    start=time.perf_counter()
+    try:
+        result=preprocess(filename_in,filename_out,center=center,chunksize=chunksize,
+                          progress=lambda status: None,gapfill=gapfill,max_gap=max_gap)
+    except Exception as e:
+        #a partial output would look up to date in the next batch
+        if os.path.exists(filename_out):
+            os.remove(filename_out)
+        return {'filename_in':filename_in,'filename_out':filename_out,'status':'failed',
+                'frames':None,'seconds':time.perf_counter()-start,'unfilled':None,
+                'error':repr(e)}
+    return dict(result,status='done')
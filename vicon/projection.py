@@ -0,0 +1,166 @@
+def project_views(xyz,views=((0,0),),lims=((-1,1),(-1,1),(-1,1)),size=None,
+                  proj_type='persp'):
+    '''Projects trajectories (frames x markers x 3) to
+    pixel coordinates and depth for one or several
+    viewing angles at once, so that the renderers only
+    draw precomputed 2D points.
+
+    All frames of all views are projected with a single
+    (batched) matrix multiplication, using the matrices
+    from vicon.projection_matrix.
+
+    Parameters
+    ----------
+    xyz: numpy array (frames x markers x 3),
+        Marker trajectories, in x,y,z coordinates
+    views: list of tuples (2 elements), optional
+        Pairs of (elevation, azimuth) viewing angles, in
+        degrees. (default=((0,0),))
+    lims: 2D list, 2D tuple, optional
+        Axis limits ((xmin,xmax),(ymin,ymax),(zmin,zmax))
+    size: tuple (2 elements), None, optional
+        Frame width and height, in pixels.
+        (default=None, i.e. (1366,768))
+    proj_type: 'persp', 'ortho', optional
+        Perspective or orthographic projection. (default='persp')
+
+    Returns
+    -------
+    points: numpy array (views x frames x markers x 3),
+        Pixel column, row (from the top) and depth (larger
+        is farther) of the markers. NaN markers stay NaN
+
+    See Also
+    --------
+    projection_matrix: builds the matrix of one view
+    rasterize: draws point-light frames from projected points
+
+    Example
+    -------
+    xyz,_=vicon.read_frames('pre_processed.traj',[500,1400])
+    sweep=[(0,azim) for azim in range(0,360,15)]
+    points=vicon.project_views(xyz-np.nanmean(xyz,axis=(0,1)),sweep,
+        ((-900,900),(-900,900),(-1000,1000)))
+    '''
+    import numpy as np
+    from .raster import projection_matrix,FRAME_SIZE
+
+    if size is None:
+        size=FRAME_SIZE
+    P=np.array([projection_matrix(elev,azim,lims,size,proj_type) for elev,azim in views])
+    xyz=np.asarray(xyz,dtype=float)
+    #(views x 1 x 4) + (frames*markers x 3).(views x 3 x 4)
+    h=np.matmul(xyz.reshape(-1,3),P[:,:,:3].transpose(0,2,1))+P[:,None,:,3]
+    with np.errstate(divide='ignore',invalid='ignore'):
+        points=h[...,:3]/h[...,3:4]
+    return points.reshape((len(P),)+xyz.shape[:-1]+(3,))
+
+def _pixel_axes(fig,size=None):
+    #2D axes covering the whole figure, with data coordinates
+    #in pixels (row from the top), to draw projected points
+    from .raster import FRAME_SIZE
+
+    width,height=FRAME_SIZE if size is None else size
+    ax=fig.add_axes([0,0,1,1])
+    ax.set_xlim(0,width)
+    ax.set_ylim(height,0)
+    ax.set_autoscale_on(False)
+    ax.axis('off')
+    return ax
+
+def _dot_colors(points,alpha=0.49):
+    #white dots with the mplot3d depth shading (alpha 0.7 of
+    #scatter applied to colors and to the collection)
+    import numpy as np
+    from .raster import _depth_shade
+
+    colors=np.ones((len(points),4))
+    colors[:,3]=alpha*_depth_shade(points)
+    return colors
+
+def _center(xyz,axislims=None,scrambled=False):
+    #centers the trajectories at the mean of the markers and
+    #returns the axis limits ((xmin,xmax),(ymin,ymax),(zmin,zmax)):
+    #those of the centered data, or of the data before centering
+    #for scrambled trajectories (as in scrambled_video)
+    import numpy as np
+
+    xyz=np.asarray(xyz,dtype=float)
+    mean=np.nanmean(np.nanmean(xyz,axis=0),axis=0)
+    return xyz-mean,_axis_lims(xyz,axislims,0 if scrambled else mean)
+
+def _axis_lims(xyz,axislims=None,mean=0):
+    #axis limits of the trajectories minus mean (see _center)
+    import numpy as np
+
+    if type(axislims)==tuple or type(axislims)==list:
+        return tuple((-lim,lim) for lim in axislims)
+    a,b,c=np.maximum(np.absolute(np.nanmin(xyz,axis=(0,1))-mean),
+                     np.absolute(np.nanmax(xyz,axis=(0,1))-mean))
+    return ((-(a+100),a+100),(-(b+100),b+100),(-c,c))
+
+def _render_points(points,edges,filename_out,fps=30,encoder=None,backend='matplotlib',
+                   patch=None,patch_level=None,tracer=None):
+    #draws and encodes the frames of projected points (frames x
+    #markers x 3), with the sticks of edges and a detector patch
+    from .raster import rasterize,FRAME_SIZE
+    from .encoder import _write_frames,_figure,_figure_frame
+
+    if backend=='raster':
+        #draw directly into the frames
+        _write_frames(rasterize(points,edges,patch=patch,patch_level=patch_level),
+                      encoder,filename_out,fps,tracer)
+        return
+
+    #ends of the sticks of all frames (frames x sticks x 2 x 2)
+    segments=points[:,edges,:2]
+    width,height=FRAME_SIZE
+
+    #matplotlib is only imported by this backend
+    from matplotlib import style
+    from matplotlib import patches as patches
+    from matplotlib.collections import LineCollection
+
+    def animate(i):
+        point=points[i]
+        #plot the points (already projected, in pixels)
+        ax.clear()
+        ax.scatter(point[:,0],point[:,1],s=20,c=_dot_colors(point))
+        #plot the sticks
+        if len(edges)>0:
+            ax.add_collection(LineCollection(segments[i],colors='w',alpha=0.5,capstyle='projecting'))
+        
+        #set axis limits, removeing grid, setting background etc
+        ax.set_xlim(0,width)
+        ax.set_ylim(height,0)
+        if patch is not None and patch_level!=None:
+            p = patches.Polygon(patch,closed=True,fill=True,fc=(patch_level,patch_level,patch_level),zorder=2,clip_on=False)
+            ax.add_patch(p)
+        ax.patch.set_facecolor('black')
+        fig.set_facecolor('black')
+        ax.axis('off')
+        ax.grid(False)
+
+    def frames():
+        for i in range(len(points)):
+            animate(i)
+            yield _figure_frame(fig)
+
+    #generate figure and render and encode the frames (the
+    #style is only set while rendering)
+    with style.context('dark_background'):
+        fig = _figure()
+        ax = _pixel_axes(fig)
+        _write_frames(frames(),encoder,filename_out,fps,tracer)
+
+def _detector_corners(detector_loc,lims):
+    #corners of the detector rectangle, on the x=0 plane, in
+    #x,y,z coordinates
+    import numpy as np
+
+    if type(detector_loc)==tuple or type(detector_loc)==list:
+        y0,z0,dy,dz=detector_loc[0],detector_loc[1],100,1000
+    else:
+        xmax,zmax=lims[0][1],lims[2][1]
+        y0,z0,dy,dz=2*xmax+xmax/8,zmax+zmax/2.8,xmax/4,zmax/2
+    return np.array([[0,y0,z0],[0,y0+dy,z0],[0,y0+dy,z0+dz],[0,y0,z0+dz]])
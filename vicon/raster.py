@@ -0,0 +1,252 @@
+#geometry of the matplotlib figures used by the renderers
+#(13.66 x 7.68 inches at 100 dpi, 3D axes with the default
+#box aspect, camera distance and 2D view limits of mplot3d)
+FRAME_SIZE=(1366,768)
+_BOX_ASPECT=(4,4,3)
+_BOX_SCALE=1.8294640721620434*25/24
+_DIST=10
+_VIEWLIM=(-0.95/_DIST,0.9/_DIST)
+
+def projection_matrix(elevation_angle=0,azimuth_angle=0,lims=((-1,1),(-1,1),(-1,1)),
+                      size=FRAME_SIZE,proj_type='persp'):
+    '''Builds the matrix that projects x,y,z coordinates
+    to pixel coordinates of the video frames, with the
+    same view as the matplotlib 3D axes used by
+    vicon.make_video (view_init and set_xlim/ylim/zlim).
+
+    Parameters
+    ----------
+    elevation_angle: float, optional
+        Elevation (height) viewing angle, in degrees. (default=0)
+    azimuth_angle: float, optional
+        Azimuth (sideways) viewing angle, in degrees. (default=0)
+    lims: 2D list, 2D tuple, optional
+        Axis limits ((xmin,xmax),(ymin,ymax),(zmin,zmax))
+    size: tuple (2 elements), optional
+        Frame width and height, in pixels. (default=(1366,768))
+    proj_type: 'persp', 'ortho', optional
+        Perspective or orthographic projection. (default='persp')
+
+    Returns
+    -------
+    P: numpy array (4 x 4),
+        Projection matrix in homogeneous coordinates:
+        (col,row,depth,w)=P.(x,y,z,1), with the pixel column
+        and row (from the top) given by col/w and row/w,
+        and the depth (in pixel units, larger is farther)
+        by depth/w
+    '''
+    import numpy as np
+
+    (xmin,xmax),(ymin,ymax),(zmin,zmax)=lims
+    aspect=np.array(_BOX_ASPECT,dtype=float)
+    aspect*=_BOX_SCALE/np.linalg.norm(aspect)
+
+    #transformation to the box of data
+    d=np.array([xmax-xmin,ymax-ymin,zmax-zmin],dtype=float)/aspect
+    world=np.array([[1/d[0],0,0,-xmin/d[0]],
+                    [0,1/d[1],0,-ymin/d[1]],
+                    [0,0,1/d[2],-zmin/d[2]],
+                    [0,0,0,1]])
+
+    #camera looking to the middle of the box from a distance
+    elev,azim=np.deg2rad(elevation_angle),np.deg2rad(azimuth_angle)
+    center=0.5*aspect
+    ps=np.array([np.cos(elev)*np.cos(azim),np.cos(elev)*np.sin(azim),np.sin(elev)])
+    eye=center+_DIST*ps
+    vertical=np.array([0,0,-1 if abs(np.rad2deg(elev)%360-180)<90 else 1])
+    w=(eye-center)/np.linalg.norm(eye-center)
+    u=np.cross(vertical,w)
+    u=u/np.linalg.norm(u)
+    v=np.cross(w,u)
+    view=np.eye(4)
+    view[:3,:3]=[u,v,w]
+    view[:3,3]=-np.dot(view[:3,:3],eye)
+    if proj_type=='ortho':
+        proj=np.array([[2,0,0,0],[0,2,0,0],[0,0,-2,0],[0,0,0,2*_DIST]])
+    else:
+        proj=np.array([[1,0,0,0],[0,1,0,0],[0,0,0,-_DIST],[0,0,-1,0]])
+    M=np.dot(proj,np.dot(view,world))
+
+    #from the 2D view limits to pixels of the square axes,
+    #centered in the frame
+    width,height=size
+    side=min(width,height)
+    scale=side/(_VIEWLIM[1]-_VIEWLIM[0])
+    screen=np.array([[scale,0,0,(width-side)/2-_VIEWLIM[0]*scale],
+                     [0,-scale,0,height-(height-side)/2+_VIEWLIM[0]*scale],
+                     [0,0,scale,0],
+                     [0,0,0,1]])
+    return np.dot(screen,M)
+
+def project(xyz,P):
+    '''Projects trajectories (frames x markers x 3) to
+    pixel coordinates and depth (frames x markers x 3),
+    using the matrix from vicon.projection_matrix.
+    '''
+    import numpy as np
+
+    xyz=np.asarray(xyz,dtype=float)
+    h=np.dot(xyz,P[:,:3].T)+P[:,3]
+    with np.errstate(divide='ignore',invalid='ignore'):
+        return h[...,:3]/h[...,3:4]
+
+def _depth_shade(points,min_alpha=0.3):
+    #alpha multipliers of the mplot3d scatter depth shading
+    import numpy as np
+
+    valid=np.isfinite(points).all(axis=1)
+    shade=np.ones(len(points))
+    if not valid.any():
+        return shade
+    p=points[valid]
+    scale=np.sqrt(((p.max(axis=0)-p.min(axis=0))**2).sum())
+    if scale>0:
+        shade[valid]=np.clip(1-(p[:,2]-p[:,2].min())/scale,min_alpha,1)
+    return shade
+
+def _draw_dots(buf,points,radius,edge,alpha):
+    import numpy as np
+
+    height,width=buf.shape
+    r=int(np.ceil(radius+edge/2+1))
+    for (cx,cy),a in zip(points,alpha):
+        if not (np.isfinite(cx) and np.isfinite(cy)):
+            continue
+        c0,c1=max(int(cx)-r,0),min(int(cx)+r+1,width)
+        r0,r1=max(int(cy)-r,0),min(int(cy)+r+1,height)
+        if c0>=c1 or r0>=r1:
+            continue
+        cols=np.arange(c0,c1)+0.5-cx
+        rows=np.arange(r0,r1)+0.5-cy
+        dist=np.sqrt(rows[:,None]**2+cols[None,:]**2)
+        tile=buf[r0:r1,c0:c1]
+        #marker face, then marker edge
+        tile+=(1-tile)*(a*np.clip(radius+0.5-dist,0,1))
+        tile+=(1-tile)*(a*np.clip(edge/2+0.5-np.absolute(dist-radius),0,1))
+
+def _draw_lines(buf,segments,width,alpha):
+    import numpy as np
+
+    height,fwidth=buf.shape
+    half=width/2
+    r=int(np.ceil(half+1))
+    for (x0,y0),(x1,y1) in segments:
+        if not np.isfinite([x0,y0,x1,y1]).all():
+            continue
+        c0,c1=max(int(min(x0,x1))-r,0),min(int(max(x0,x1))+r+1,fwidth)
+        r0,r1=max(int(min(y0,y1))-r,0),min(int(max(y0,y1))+r+1,height)
+        if c0>=c1 or r0>=r1:
+            continue
+        px=np.arange(c0,c1)[None,:]+0.5-x0
+        py=np.arange(r0,r1)[:,None]+0.5-y0
+        dx,dy=x1-x0,y1-y0
+        length2=dx*dx+dy*dy
+        if length2>0:
+            t=np.clip((px*dx+py*dy)/length2,0,1)
+        else:
+            t=0
+        dist=np.sqrt((px-t*dx)**2+(py-t*dy)**2)
+        a=alpha*np.clip(half+0.5-dist,0,1)
+        tile=buf[r0:r1,c0:c1]
+        tile+=(1-tile)*a
+
+def _fill_polygon(buf,polygon,level):
+    import numpy as np
+
+    height,width=buf.shape
+    polygon=np.asarray(polygon,dtype=float)
+    if not np.isfinite(polygon).all():
+        return
+    c0,c1=max(int(polygon[:,0].min()),0),min(int(np.ceil(polygon[:,0].max()))+1,width)
+    r0,r1=max(int(polygon[:,1].min()),0),min(int(np.ceil(polygon[:,1].max()))+1,height)
+    if c0>=c1 or r0>=r1:
+        return
+    px=np.arange(c0,c1)[None,:]+0.5
+    py=np.arange(r0,r1)[:,None]+0.5
+    inside=np.zeros((r1-r0,c1-c0),dtype=bool)
+    #even-odd rule
+    for (xa,ya),(xb,yb) in zip(polygon,np.roll(polygon,-1,axis=0)):
+        if ya==yb:
+            continue
+        crosses=(ya>py)!=(yb>py)
+        xcross=xa+(py-ya)*(xb-xa)/(yb-ya)
+        inside^=crosses&(px<xcross)
+    buf[r0:r1,c0:c1][inside]=level
+
+def rasterize(points,edges=(),size=FRAME_SIZE,patch=None,patch_level=None,
+              dot_radius=3.106,dot_edge=1.389,dot_alpha=0.49,line_width=2.083,
+              line_alpha=0.5,depthshade=True):
+    '''Draws point-light frames directly into RGB
+    buffers: anti-aliased white dots and sticks on a
+    black background, optionally with a detector patch.
+
+    Parameters
+    ----------
+    points: numpy array (frames x markers x 3),
+        Pixel coordinates and depth of the markers (see
+        vicon.project). NaN markers are not drawn
+    edges: 2D list, 2D tuple, numpy array (E x 2), optional
+        Pairs of markers linked by a stick
+    size: tuple (2 elements), optional
+        Frame width and height, in pixels. (default=(1366,768))
+    patch: numpy array (frames x vertices x 2), (vertices x 2), None
+        Pixel coordinates of the detector patch polygon
+    patch_level: float (0-1), None, optional
+        Brightness of the detector patch
+    dot_radius, dot_edge, dot_alpha, line_width, line_alpha: float, optional
+        Size (in pixels) and opacity of dots and sticks,
+        matching the matplotlib defaults
+    depthshade: bool, optional
+        If True, farther dots are more transparent, as in
+        mplot3d scatter plots. (default=True)
+
+    Returns
+    -------
+    frames: generator,
+        Yields numpy arrays (height x width x 3), uint8.
+        The same buffer is reused for every frame
+    '''
+    import numpy as np
+
+    width,height=size
+    edges=np.asarray(edges,dtype=int).reshape(-1,2)
+    #ends of the sticks of all frames (frames x sticks x 2 x 2)
+    segments=np.asarray(points)[:,edges,:2]
+    gray=np.zeros((height,width),dtype=np.float32)
+    rgb=np.zeros((height,width,3),dtype=np.uint8)
+    if patch is not None:
+        patch=np.asarray(patch,dtype=float)
+    margin=int(np.ceil(max(dot_radius+dot_edge,line_width)))+2
+    prev=(0,0,0,0)
+    for i in range(len(points)):
+        p=points[i]
+        #only the region with drawings (in this frame or in the
+        #previous one) is cleared and converted
+        corners=p[:,:2][np.isfinite(p[:,:2]).all(axis=1)]
+        if patch is not None and patch_level is not None:
+            corners=np.concatenate([corners,patch if patch.ndim==2 else patch[i]])
+        if len(corners)>0 and np.isfinite(corners).all():
+            lo=np.floor(corners.min(axis=0)).astype(int)-margin
+            hi=np.ceil(corners.max(axis=0)).astype(int)+margin
+            box=(max(lo[1],0),min(hi[1],height),max(lo[0],0),min(hi[0],width))
+        else:
+            box=(0,height,0,width)
+        gray[prev[0]:prev[1],prev[2]:prev[3]]=0
+        if depthshade and p.shape[1]>2:
+            alpha=dot_alpha*_depth_shade(p)
+        else:
+            alpha=np.full(len(p),dot_alpha)
+        _draw_dots(gray,p[:,:2],dot_radius,dot_edge,alpha)
+        if len(edges)>0:
+            _draw_lines(gray,segments[i],line_width,line_alpha)
+        if patch is not None and patch_level is not None:
+            _fill_polygon(gray,patch if patch.ndim==2 else patch[i],patch_level)
+        r0,r1=min(prev[0],box[0]),max(prev[1],box[1])
+        c0,c1=min(prev[2],box[2]),max(prev[3],box[3])
+        if r0<r1 and c0<c1:
+            region=gray[r0:r1,c0:c1]*255
+            np.rint(region,out=region)
+            rgb[r0:r1,c0:c1]=region[:,:,None]
+        prev=box
+        yield rgb
@@ -0,0 +1,107 @@
+def read_vicon(filename_in,chunksize=10000,nmarkers=20):
+    '''Opens a CSV file from VICON Motion Capture and
+    reads the Trajectories block in bounded-size chunks,
+    so that the memory used does not depend on the
+    length of the acquisition.
+
+    The file is read only once: the lines before the
+    Trajectories block are skipped while searching for
+    it, then the header of the block is parsed and the
+    returned generator continues from the first data
+    line.
+
+    Parameters
+    ----------
+    filename_in: str,
+        Path and name of the original CSV from the VICON
+        acquisition
+    chunksize: int, optional
+        Maximum number of frames in each chunk.
+        (default=10000)
+    nmarkers: int, optional
+        Number of markers (X,Y,Z column triplets) to be
+        read. (default=20)
+
+    Returns
+    -------
+    header: dict,
+        Information of the Trajectories block:
+            'rate': capture rate, in Hz (None if absent)
+            'markers': list of marker names
+            'columns': list of the X,Y,Z column positions
+    chunks: generator,
+        Yields numpy arrays (frames x markers x 3) with
+        the marker trajectories, in x,y,z coordinates.
+        Missing (occluded) markers are NaN.
+
+    See Also
+    --------
+    preprocess: reads a CSV file from VICON Motion Capture and
+        creates a new CSV file only with the trajectories
+
+    Example
+    -------
+    header,chunks=vicon.read_vicon('C:\\Users\\MyUser\\Documents\\Vicon\\acquisition.csv')
+    for xyz in chunks:
+        print(xyz.shape)
+    '''
+    f=open(filename_in)
+    try:
+        #searching for the Trajectories block
+        for line in f:
+            if line.split(',')[0].strip()=='Trajectories':
+                break
+        else:
+            raise ValueError('no Trajectories block found in '+str(filename_in))
+        rate_line=f.readline()
+        marker_line=f.readline().rstrip('\r\n').split(',')
+        column_line=f.readline().rstrip('\r\n').split(',')
+        f.readline() #units
+        #positions of the X,Y,Z columns of each marker
+        cols=[]
+        for axis in ('X','Y','Z'):
+            pos=[k for k,name in enumerate(column_line) if name.strip()==axis]
+            cols.append(pos[:nmarkers])
+        if len(cols[0])==0 or not len(cols[0])==len(cols[1])==len(cols[2]):
+            raise ValueError('invalid Trajectories header in '+str(filename_in))
+        try:
+            rate=float(rate_line.split(',')[0])
+        except ValueError:
+            rate=None
+        markers=[]
+        for k in cols[0]:
+            if k<len(marker_line):
+                markers.append(marker_line[k].strip())
+            else:
+                markers.append('')
+    except BaseException:
+        f.close()
+        raise
+    header={'rate':rate,'markers':markers,'columns':cols}
+    return header,_iter_chunks(f,cols,len(column_line),chunksize)
+
+def _iter_chunks(f,cols,ncols,chunksize):
+    import io
+    import itertools
+    import numpy as np
+    import pandas as pd
+
+    usecols=cols[0]+cols[1]+cols[2]
+    nmarkers=len(cols[0])
+    with f:
+        while True:
+            lines=list(itertools.islice(f,chunksize))
+            #the block ends at the first blank line (or end of file)
+            for k,line in enumerate(lines):
+                if line.strip()=='':
+                    lines=lines[:k]
+                    break
+            if len(lines)==0:
+                return
+            data=pd.read_csv(io.StringIO(''.join(lines)),header=None,
+                             names=range(ncols),usecols=usecols)
+            values=data[usecols].to_numpy(dtype=float)
+            xyz=np.ascontiguousarray(values.reshape(len(lines),3,nmarkers).transpose(0,2,1))
+            yield xyz
+            if len(lines)<chunksize:
+                return
@@ -0,0 +1,132 @@
+def rotation_angle(xyz,prev_theta=None):
+    '''Calculates, for every frame, the angle of the
+    rotation around the z-axis that aligns the view
+    with the neck-shoulder axis (marker 6, left
+    shoulder), including the quadrant unwrapping
+    used by vicon.preprocess.
+
+    Parameters
+    ----------
+    xyz: numpy array (frames x markers x 3),
+        Trajectories already translated to the
+        neck (marker 4) origin
+    prev_theta: float, None, optional
+        Angle of the frame preceding the first one, when
+        the trajectories are processed in consecutive
+        chunks. (default=None, i.e. first frame of the
+        acquisition)
+
+    Returns
+    -------
+    theta: numpy array (frames),
+        Rotation angle of each frame, in radians
+
+    See Also
+    --------
+    reframe: changes the reference frame of the trajectories
+    '''
+    import numpy as np
+
+    numframes=xyz.shape[0]
+    theta=np.zeros(numframes)
+    if numframes==0:
+        return theta
+
+    #calculate new axis angle (1st and 4th quadrant)
+    x6=xyz[:,6,0].astype(float)
+    y6=xyz[:,6,1].astype(float)
+    with np.errstate(divide='ignore',invalid='ignore'):
+        raw=np.where(np.absolute(y6)<10,np.pi/2,np.arctan(-x6/y6))
+
+    #quadrant unwrapping: each frame is either raw or raw+pi,
+    #depending on the angle of the previous frame. The choice
+    #for each frame is evaluated for both possible previous
+    #states, then the chain of choices is resolved at once
+    def shifted(cur,prev):
+        return (((cur<=0)&(prev>=0)&(prev<np.pi)) #2nd quadrant
+                |((cur>0)&(prev>=3)&(cur<=1.6))) #3rd quadrant
+    cur=raw[1:]
+    if_not=shifted(cur,raw[:-1])          #previous frame was not shifted
+    if_shifted=shifted(cur,raw[:-1]+np.pi) #previous frame was shifted
+    if prev_theta is None:
+        first=False
+    else:
+        first=bool(shifted(raw[0],prev_theta))
+    #frames whose state does not depend on the previous one
+    fixed=np.concatenate(([True],if_not==if_shifted))
+    value=np.concatenate(([first],if_not))
+    #frames whose state is the negation of the previous one
+    flip=np.concatenate(([False],if_not&~if_shifted)).astype(np.int64)
+    last_fixed=np.maximum.accumulate(np.where(fixed,np.arange(numframes),0))
+    nflips=np.cumsum(flip)
+    state=value[last_fixed]^((nflips-nflips[last_fixed])%2==1)
+    theta=raw+np.pi*state
+    return theta
+
+def reframe(xyz,center=None,prev_theta=None,return_theta=False):
+    '''Changes the reference frame of VICON trajectories,
+    operating on all frames at once.
+
+    Parameters
+    ----------
+    xyz: numpy array (frames x markers x 3),
+        Marker trajectories, in x,y,z coordinates
+    center: str, optional
+        The option to re-reference the viewing perspective:
+        options:
+            center='shoulder': translation to the neck
+                (marker 4) followed by rotation around the
+                z-axis along the neck-shoulder axis
+            center='mean': changes the axis origin to the
+                mean of the markers at each frame
+            center=None: no effect (default)
+    prev_theta: float, None, optional
+        Rotation angle of the frame preceding the first
+        one, to continue the quadrant unwrapping of a
+        previous chunk (center='shoulder' only).
+        (default=None)
+    return_theta: bool, optional
+        If True, also returns the rotation angle of the
+        last frame, to be passed as prev_theta to the
+        next chunk. (default=False)
+
+    Returns
+    -------
+    xyz: numpy array (frames x markers x 3),
+        The trajectories in the new reference frame
+    theta: float, None
+        Rotation angle of the last frame (only if
+        return_theta=True)
+
+    See Also
+    --------
+    preprocess: reads a CSV file from VICON Motion Capture and
+        creates a new CSV file only with the trajectories
+    '''
+    import warnings
+    import numpy as np
+
+    xyz=np.array(xyz,dtype=float)
+    theta=None
+    if center=='shoulder':
+        #coordinate translation to X5 (neck)
+        xyz=xyz-xyz[:,4:5,:]
+        #coordinate rotation around z-axis to X6 (left shoulder) direction
+        angles=rotation_angle(xyz,prev_theta=prev_theta)
+        if len(angles)>0:
+            theta=angles[-1]
+        else:
+            theta=prev_theta
+        theta2=-angles
+        cos,sin=np.cos(theta2)[:,None],np.sin(theta2)[:,None]
+        x,y=xyz[:,:,0],xyz[:,:,1]
+        xyz[:,:,0],xyz[:,:,1]=x*cos-y*sin,x*sin+y*cos
+    elif center=='mean':
+        #coordinate translation to mean (missing markers are ignored)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore',category=RuntimeWarning)
+            mean=np.nanmean(np.ascontiguousarray(xyz.transpose(2,0,1)),axis=2)
+        xyz=xyz-mean.T[:,None,:]
+    if return_theta:
+        return xyz,theta
+    return xyz
@@ -0,0 +1,157 @@
+def render_batch(filename_in,specs,framerange=None,fps=30,axislims=None,backend='raster',
+                 processes=None,encoder=None,tracer=None,resample=False,units='frames'):
+    '''Uses pre-processed VICON data to generate many
+    videos of the same trajectories, e.g. at several
+    viewing angles, or both biological and scrambled.
+
+    The trajectories are read and centered once, all
+    views are projected together (see vicon.project_views)
+    and the videos are drawn and encoded by parallel
+    worker processes.
+
+    Parameters
+    ----------
+    filename_in: str, vicon.Trajectory,
+        Path and name of the preprocessed CSV or binary
+        trajectory file from the VICON acquisition (see
+        vicon.preprocess function), or its Trajectory
+    specs: list of dict,
+        One dict for each video, with the keys:
+            'filename_out': path and name of the MP4 video
+                file to be created (required)
+            'elevation_angle', 'azimuth_angle': viewing
+                angles, in degrees (default=0)
+            'scrambletype': None for the original motion
+                (default), or the type of scrambling (see
+                vicon.scramble)
+            'seed': seed of the scrambling (default=None)
+            'links': pairs of linked markers (see
+                vicon.skeleton_edges) (default='original'
+                if not scrambled, else None)
+            'detector': brightness (0-1) of the detector
+                corner, or None (default=None)
+            'detector_loc': detector location, in y,z
+                coordinates (see vicon.scrambled_video)
+                (default=None)
+    framerange: int, list (2 elements), tuple (2 elements), optional
+        Range of frames from the input file to be used to
+        generate the videos: number of frames from the
+        start (int) or first and end (excluded) frames
+        (or seconds, see units)
+    fps: int, optional
+        Frames per second of the generated videos. (default=30)
+    axislims: list (3 elements), tuple (3 elements), None, optional
+        Defines the axis limits, in x,y,z coordinates. The
+        generated plot will range from -x to x, -y to y and
+        -z to z. If None, it will obtain the limits from the
+        data (default): the centered data, as in
+        vicon.make_video, or, for the scrambled videos, the
+        data before centering, as in vicon.scrambled_video.
+    backend: 'matplotlib', 'raster', optional
+        Rendering backend (see vicon.make_video).
+        (default='raster')
+    processes: int, None, optional
+        Number of worker processes. If None, uses the number
+        of CPUs; if 1, renders the videos one after another.
+        (default=None)
+    encoder: dict, None, optional
+        Video encoding options (see vicon.VideoEncoder).
+        (default=None, i.e. libx264 at 1800 kbit/s)
+    tracer: vicon.Tracer, None, optional
+        Collects the time spent in each stage (see
+        vicon.Tracer). The drawing and encoding stages are
+        timed in the worker processes, and are not profiled.
+        (default=None)
+    resample: bool, float, optional
+        If True, the trajectories are resampled from the
+        capture rate to fps (see vicon.make_video), or from
+        the given rate, in Hz. (default=False)
+    units: 'frames', 'seconds', optional
+        Units of framerange. (default='frames')
+
+    Returns
+    -------
+    filenames: list of str,
+        The names of the generated videos, in the order of
+        specs (output videos are saved in these files)
+
+    See Also
+    --------
+    make_video: uses pre-processed VICON data to generate
+        video of the movement at specified viewing angle
+    scrambled_video: uses pre-processed VICON data to produce
+        video of scrambled points (non-biological motion)
+
+    Example
+    -------
+    specs=[{'filename_out':'walk_az'+str(azim)+'.mp4','azimuth_angle':azim}
+           for azim in range(0,360,30)]
+    specs.append({'filename_out':'walk_scrambled.mp4','scrambletype':'constrained','seed':1})
+    vicon.render_batch('C:\\Users\\MyUser\\Documents\\Vicon\\pre_processed.traj',specs,
+        framerange=[500,1400],axislims=(800,800,1200))
+    '''
+    from .resample import _read_trajectories
+    from .projection import project_views,_center,_axis_lims,_detector_corners
+    from .scramble import scramble
+    from .skeleton import skeleton_edges
+    from .tracing import _get_tracer,_map_jobs
+
+    if encoder is not None and not isinstance(encoder,dict):
+        raise TypeError('encoder must be a dict of encoding options')
+    trace=tracer is not None
+    tracer=_get_tracer(tracer)
+
+    with tracer.capture():
+        #read (and resample) and center data once
+        xyz,_=_read_trajectories(filename_in,framerange,fps,resample,units,tracer)
+        with tracer.stage('center',len(xyz)):
+            #(the axis limits of the scrambled videos are those of the
+            #data before centering, as in scrambled_video)
+            if any(spec.get('scrambletype') is not None for spec in specs):
+                scrambled_lims=_axis_lims(xyz,axislims)
+            xyz,lims=_center(xyz,axislims)
+
+        #project all views of the original motion at once
+        views=[(spec.get('elevation_angle',0),spec.get('azimuth_angle',0)) for spec in specs]
+        original=[k for k,spec in enumerate(specs) if spec.get('scrambletype') is None]
+        points=[None]*len(specs)
+        if original:
+            with tracer.stage('project',len(xyz)*len(original)):
+                projected=project_views(xyz,[views[k] for k in original],lims)
+            for k,p in zip(original,projected):
+                points[k]=p
+
+        jobs=[]
+        for k,spec in enumerate(specs):
+            scrambletype=spec.get('scrambletype')
+            spec_lims=lims
+            if scrambletype is not None:
+                spec_lims=scrambled_lims
+                with tracer.stage('scramble',len(xyz)):
+                    scrambled=scramble(xyz,scrambletype,spec.get('seed'))
+                with tracer.stage('project',len(xyz)):
+                    points[k]=project_views(scrambled,[views[k]],spec_lims)[0]
+            links=spec.get('links','original' if scrambletype is None else None)
+            detector=spec.get('detector')
+            patch=None
+            if detector is not None:
+                corners=_detector_corners(spec.get('detector_loc'),spec_lims)
+                patch=project_views(corners,[views[k]],spec_lims)[0,:,:2]
+            jobs.append(((points[k],skeleton_edges(links,xyz.shape[1]),spec['filename_out'],
+                          fps,encoder,backend,patch,detector),trace))
+
+    #draw and encode the videos (the stages timed by the
+    #workers are added to the tracer)
+    list(_map_jobs(_render_job,jobs,processes,tracer))
+    return [spec['filename_out'] for spec in specs]
+
+def _render_job(job):
+    #draws and encodes one video (run in a worker process),
+    #returning the records of the traced stages
+    from .projection import _render_points
+    from .tracing import Tracer
+
+    args,trace=job
+    records=[]
+    _render_points(*args,tracer=Tracer(callback=records.append) if trace else None)
+    return records
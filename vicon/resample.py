@@ -0,0 +1,147 @@
+def resample(xyz,rate,fps=30,method='linear'):
+    '''Resamples marker trajectories from the capture
+    rate to the frame rate of the video, so that the
+    video plays at the speed of the movement and only
+    the frames that are shown are rendered.
+
+    The times of all output frames are computed at once,
+    and the trajectories are interpolated (or decimated,
+    if the capture rate is a multiple of fps) on the
+    array, without a loop over frames.
+
+    Parameters
+    ----------
+    xyz: numpy array (frames x markers x 3),
+        Marker trajectories, in x,y,z coordinates
+    rate: float,
+        Capture rate of the trajectories, in Hz
+    fps: float, optional
+        Frames per second of the video. (default=30)
+    method: 'linear', 'nearest', optional
+        'linear' interpolates between the two nearest
+        captured frames; 'nearest' takes the nearest
+        captured frame. (default='linear')
+
+    Returns
+    -------
+    resampled: numpy array (frames x markers x 3),
+        Trajectories at fps frames per second, starting at
+        the first frame of xyz. Frames taken from a single
+        captured frame are copied exactly (e.g. every 4th
+        frame of a 120 Hz capture at 30 fps)
+
+    See Also
+    --------
+    make_video: generates a video of the movement (with
+        resample=True, the trajectories are resampled)
+
+    Example
+    -------
+    xyz,header=vicon.read_frames('pre_processed.traj')
+    xyz=vicon.resample(xyz,header['rate'],fps=60)
+    '''
+    import numpy as np
+
+    if method not in ('linear','nearest'):
+        raise ValueError("method must be 'linear' or 'nearest'")
+    if not rate>0 or not fps>0:
+        raise ValueError('rate and fps must be positive')
+    xyz=np.asarray(xyz)
+    numframes=len(xyz)
+    if numframes==0:
+        return np.array(xyz)
+
+    #positions of the output frames, in captured frames
+    step=rate/fps
+    position=np.arange(_resampled_count(numframes,rate,fps))*step
+    if method=='nearest':
+        return xyz[np.minimum(np.rint(position).astype(int),numframes-1)]
+    first=np.minimum(np.floor(position+1e-9).astype(int),numframes-1)
+    weight=np.clip(position-first,0,None)
+    resampled=xyz[first]
+    #(frames between two captured frames; the others are copied,
+    #so that a missing neighbour does not make them NaN)
+    between=np.nonzero(weight>1e-9)[0]
+    if len(between)>0:
+        x0=xyz[first[between]]
+        x1=xyz[first[between]+1]
+        resampled[between]=x0+weight[between,None,None]*(x1-x0)
+    return resampled
+
+def _resampled_count(numframes,rate,fps=30):
+    #number of frames of numframes captured frames resampled to fps
+    #(see resample)
+    import math
+
+    if numframes==0:
+        return 0
+    return int(math.floor((numframes-1)/(rate/fps)+1e-9))+1
+
+def _frame_range(framerange,rate,units='frames'):
+    #converts a range of frames or seconds (see make_video) to a
+    #range of captured frames
+    if units=='frames':
+        return framerange
+    if units!='seconds':
+        raise ValueError("units must be 'frames' or 'seconds'")
+    if rate is None:
+        raise ValueError('the capture rate is unknown: framerange cannot be given in seconds')
+    if framerange is None:
+        return None
+    if type(framerange)==list or type(framerange)==tuple:
+        return [int(round(framerange[0]*rate)),int(round(framerange[1]*rate))]
+    return int(round(framerange*rate))
+
+def _capture_rate(filename_in,resampling=False):
+    #capture rate of a Trajectory or a preprocessed file: the
+    #resampling argument if it is a number, else the rate of the
+    #Trajectory or in the binary file header
+    from .trajectory import Trajectory
+    from .trajectory_file import is_trajectory_file,load_trajectory
+
+    if resampling is not True and resampling is not False and resampling is not None:
+        return float(resampling)
+    if isinstance(filename_in,Trajectory):
+        return filename_in.rate
+    if is_trajectory_file(filename_in):
+        return load_trajectory(filename_in)[1]['rate']
+    return None
+
+def _read_trajectories(filename_in,framerange=None,fps=30,resampling=False,units='frames',
+                       tracer=None):
+    #reads the frames of a Trajectory or a preprocessed file used by
+    #a video (see make_video), resampled to fps if requested, and
+    #returns them with their header ('rate', 'markers' and 'window',
+    #the range of frames read)
+    from .trajectory import Trajectory
+    from .trajectory_file import read_frames
+    from .tracing import _get_tracer
+
+    tracer=_get_tracer(tracer)
+    rate=None
+    if resampling or units!='frames':
+        rate=_capture_rate(filename_in,resampling)
+        if resampling and rate is None:
+            raise ValueError('the capture rate of '+str(filename_in)+' is unknown: pass it '
+                             +'as resample (e.g. resample=120)')
+    framerange=_frame_range(framerange,rate,units)
+    with tracer.stage('read') as record:
+        if isinstance(filename_in,Trajectory):
+            #(a view on the frames of the Trajectory)
+            if type(framerange)==int:
+                framerange=[0,framerange]
+            elif framerange is None:
+                framerange=[0,None]
+            xyz=filename_in.xyz[framerange[0]:framerange[1]]
+            header={'rate':filename_in.rate,'markers':filename_in.markers}
+        else:
+            xyz,header=read_frames(filename_in,framerange)
+        record['frames']=len(xyz)
+    start=framerange[0] if type(framerange)==list or type(framerange)==tuple else 0
+    header={'rate':header['rate'] if rate is None else rate,'markers':header['markers'],
+            'window':[start,start+len(xyz)]}
+    if resampling:
+        with tracer.stage('resample',len(xyz)):
+            xyz=resample(xyz,rate,fps)
+        header['rate']=fps
+    return xyz,header
@@ -0,0 +1,105 @@
+#pairs of markers swapped by the pairwise scrambling: 4 first
+#are arms, next 4 are legs, final 2 are head/shoulder
+_PAIRS=((0,2),(1,3),(6,7),(8,9),(10,11),(12,13),(14,15),(16,17),(4,18),(5,19))
+
+def scramble(xyz,scrambletype='pairwise',seed=None,size=None):
+    '''Scrambles the positions of the markers, keeping
+    their local motion (non-biological motion stimuli).
+    Each marker is displaced by a constant offset, so
+    the whole trajectory is scrambled at once.
+
+    Parameters
+    ----------
+    xyz: numpy array (frames x markers x 3),
+        Marker trajectories, in x,y,z coordinates,
+        centered at the origin
+    scrambletype: str, optional
+        The type of scrambling to be adopted. Options:
+            'scrambled': random offsets within 2/3 of the
+                range of the markers at the initial frame.
+                May lead to slightly larger motion area than
+                the original trajectories
+            'constrained': random offsets keeping the
+                markers at all frames within the limits of
+                the original trajectories (also used for any
+                other value)
+            'pairwise': pairwise scrambling of positions,
+                following procedure by Kim et al (2015)
+                doi:10.1167/15.11.13 (20 markers only)
+                (default)
+    seed: int, numpy Generator, None, optional
+        Seed or random number generator of the scrambling,
+        for reproducible stimuli. (default=None)
+    size: int, None, optional
+        If given, the number of scrambled versions of the
+        trajectories to be generated at once. (default=None)
+
+    Returns
+    -------
+    scrambled: numpy array (frames x markers x 3), or
+        (size x frames x markers x 3) if size is given
+
+    See Also
+    --------
+    scrambled_video: uses pre-processed VICON data to produce
+        video of scrambled points (non-biological motion)
+
+    Example
+    -------
+    xyz,_=vicon.read_frames('pre_processed.traj',[500,1400])
+    stimuli=vicon.scramble(xyz-np.nanmean(xyz,axis=(0,1)),'constrained',seed=1,size=50)
+    '''
+    import numpy as np
+
+    rng=np.random.default_rng(seed)
+    xyz=np.asarray(xyz,dtype=float)
+    n=1 if size is None else size
+    if scrambletype=='scrambled':
+        offsets=_scrambled_offsets(xyz,rng,n)
+    elif scrambletype=='pairwise':
+        offsets=_pairwise_offsets(xyz,rng,n)
+    else:
+        offsets=_constrained_offsets(xyz,rng,n)
+    #offsets (n x markers x 3) broadcast over the frames
+    scrambled=xyz[None]+offsets[:,None]
+    return scrambled[0] if size is None else scrambled
+
+def _scrambled_offsets(xyz,rng,n):
+    import numpy as np
+
+    first=xyz[0]
+    lo,hi=2*np.nanmin(first,axis=0)/3,2*np.nanmax(first,axis=0)/3
+    return rng.uniform(lo,hi,(n,)+xyz.shape[1:])
+
+def _constrained_offsets(xyz,rng,n):
+    import numpy as np
+
+    #constraint limits, and range of each marker (computed once)
+    lims_lo,lims_hi=np.nanmin(xyz,axis=(0,1)),np.nanmax(xyz,axis=(0,1))
+    marker_lo,marker_hi=np.nanmin(xyz,axis=0),np.nanmax(xyz,axis=0)
+    #offsets keeping each marker within the limits at all frames
+    lo,hi=lims_lo-marker_lo,lims_hi-marker_hi
+    return rng.uniform(lo,hi,(n,)+xyz.shape[1:])
+
+def _pairwise_offsets(xyz,rng,n):
+    import numpy as np
+
+    if xyz.shape[1]!=20:
+        raise ValueError('pairwise scrambling requires 20 markers')
+    pairs=np.array(_PAIRS)
+    centroid=np.nanmean(xyz,axis=0)
+    offsets=np.empty((n,)+xyz.shape[1:])
+    for k in range(n):
+        #an arm pair never takes the place of an arm pair, and a
+        #leg pair never takes the place of a leg pair
+        while True:
+            order=rng.permutation(len(pairs))
+            if (order[:4]>=4).all() and ((order[4:8]<4)|(order[4:8]>=8)).all():
+                break
+        #each marker moves to the centroid of a marker of the
+        #new pair (in reversed order)
+        target=np.empty(20,dtype=int)
+        target[pairs[:,0]]=pairs[order,1]
+        target[pairs[:,1]]=pairs[order,0]
+        offsets[k]=centroid[target]-centroid
+    return offsets
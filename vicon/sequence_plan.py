@@ -0,0 +1,453 @@
+#specification of the experiment of vicon.create_video_sequence: an
+#intro, then blocks of shuffled trials, each followed by a short
+#rest, and a long rest after each block
+SEQUENCE_SPEC={'fps':30,
+               'seed':None,
+               'blocks':3,
+               'shuffle':True,
+               'skip':10,
+               'intro':{'function':'gen_detector_intro','seconds':15},
+               'trials':[{'name':'biological','function':'make_video','count':5,'seconds':30,
+                          'params':{'edgetype':None,'axislims':(800,800,1200)}},
+                         {'name':'scrambled','function':'scrambled_video','count':5,'seconds':30,
+                          'params':{'detector':1,'scrambletype':'constraint',
+                                    'axislims':(800,800,1200),'detector_loc':(1350,1400)}}],
+               'rest':{'function':'central_dot','seconds':3,'params':{'detector':0.3}},
+               'block_rest':{'function':'central_dot','seconds':15,'params':{'detector':0.3}}}
+
+_functions=('make_video','scrambled_video','central_dot','gen_detector_intro')
+
+def plan_sequence(spec,walks,encoder=None):
+    '''Compiles the specification of an experiment into
+    the clips to be rendered and the segments of the
+    video sequence, without rendering anything.
+
+    Each clip is identified by a key that hashes its
+    rendering function, its parameters and the contents
+    of its input file (see vicon.ClipCache), so identical
+    clips (e.g. the rests) are rendered once, and a clip
+    keeps its key as long as it does not change. The clips
+    do not depend on each other; the sequence depends on
+    all of them.
+
+    The random choices of each trial (walk file, start
+    frame and scrambling seed) are drawn from its own seed,
+    derived from the seed of the specification and the
+    block, type and number of the trial, so changing a
+    part of the specification (e.g. the rest durations or
+    the count of a trial type) does not change the other
+    trials.
+
+    Parameters
+    ----------
+    spec: dict,
+        Specification of the experiment. Missing keys are
+        taken from vicon.SEQUENCE_SPEC (the experiment of
+        vicon.create_video_sequence):
+            'fps': frames per second of the sequence
+            'seed': seed of the random choices (None for a
+                new random sequence)
+            'blocks': number of blocks
+            'shuffle': if True, the trials of each block are
+                in random order, else in the order of 'trials'
+            'skip': seconds skipped at the start of the walks
+            'intro', 'rest', 'block_rest': clips at the start,
+                after each trial and after each block (or
+                None), as dicts with 'function'
+                ('central_dot' or 'gen_detector_intro'),
+                'seconds' and 'params' (other arguments)
+            'trials': list of trial types, as dicts with
+                'name', 'function' ('make_video' or
+                'scrambled_video'), 'count' (per block),
+                'seconds' and 'params' (other arguments; with
+                'resample', 'seconds' are seconds of capture)
+    walks: list of str, vicon.Trajectory,
+        Preprocessed trajectory files (CSV or binary), or
+        Trajectory objects, from which the trials are taken
+    encoder: dict, None, optional
+        Video encoding options of the clips (see
+        vicon.segment_encoder). (default=None)
+
+    Returns
+    -------
+    plan: dict,
+        'seed': seed of the sequence (to reproduce it)
+        'fps': frames per second
+        'jobs': dict of the clips to be rendered, by key,
+            as (function name, arguments) (without the output)
+        'segments': list of the segments of the sequence, in
+            order, as dicts with 'key', 'kind' ('intro',
+            'trial', 'rest' or 'block_rest'), 'name' (trial
+            type), 'block', 'trial', 'function', 'frames' and
+            'seconds' (duration of the clip), 'source' (walk
+            file, or 'sha256:' and the digest of a Trajectory),
+            'walk' (index in walks), 'window' (frames of the
+            walk), 'seed' and 'detector'
+
+    See Also
+    --------
+    build_sequence: renders the clips that changed and joins them
+    sequence_events: timing of the segments of the sequence
+
+    Example
+    -------
+    spec=dict(vicon.SEQUENCE_SPEC,blocks=2,seed=7)
+    plan=vicon.plan_sequence(spec,['walk1.traj','walk2.traj'])
+    print(len(plan['jobs']),'clips,',len(plan['segments']),'segments')
+    '''
+    import copy
+    import numpy as np
+    from .trajectory import Trajectory
+    from .trajectory_file import count_frames
+    from .resample import _capture_rate,_resampled_count
+    from .cache import _clip_key
+    from .assemble import segment_encoder
+
+    spec=dict(copy.deepcopy(SEQUENCE_SPEC),**copy.deepcopy(spec))
+    fps=spec['fps']
+    seedseq=np.random.SeedSequence(spec['seed'])
+    entropy=seedseq.entropy
+    walks=list(walks)
+    options=segment_encoder(encoder,fps=fps)
+    for clip in [spec['intro'],spec['rest'],spec['block_rest']]+spec['trials']:
+        if clip is not None and clip['function'] not in _functions:
+            raise ValueError('unknown rendering function '+repr(clip['function']))
+    if spec['trials'] and not walks:
+        raise ValueError('no walks to take the trials from')
+
+    jobs={}
+    segments=[]
+    def add(kind,function,kwargs,frames,**info):
+        #adds a clip (once) and its segment
+        #(all clips are encoded with the same options)
+        kwargs=dict(kwargs,encoder=options)
+        params={k:v for k,v in kwargs.items() if k!='filename_in'}
+        key=_clip_key(function,params,kwargs.get('filename_in'))
+        jobs.setdefault(key,(function,kwargs))
+        segment={'key':key,'kind':kind,'name':None,'block':None,'trial':None,
+                 'function':function,'seconds':frames/fps,'frames':frames,
+                 'source':None,'walk':None,'window':None,'seed':kwargs.get('seed'),
+                 'detector':kwargs.get('detector')}
+        segment.update(info)
+        segments.append(segment)
+
+    def add_clip(kind,clip,**info):
+        if clip is not None:
+            kwargs=dict(clip.get('params') or {},seconds=clip['seconds'],fps=fps)
+            add(kind,clip['function'],kwargs,int(round(clip['seconds']*fps)),**info)
+
+    sources={}
+    def source(k):
+        #(name of a walk in the events, found once)
+        if k not in sources:
+            sources[k]=_source_name(walks[k])
+        return sources[k]
+
+    numframes={}
+    def length(walk):
+        #(number of frames of a walk, counted once)
+        if isinstance(walk,Trajectory):
+            return walk.numframes
+        if walk not in numframes:
+            numframes[walk]=count_frames(walk)
+        return numframes[walk]
+
+    add_clip('intro',spec['intro'])
+    for block in range(spec['blocks']):
+        #(type, number) of the trials of the block
+        order=[(t,n) for t,trial in enumerate(spec['trials']) for n in range(trial['count'])]
+        if spec['shuffle']:
+            rng=np.random.default_rng(np.random.SeedSequence(entropy,spawn_key=(0,block)))
+            order=[order[k] for k in rng.permutation(len(order))]
+        for number,(t,n) in enumerate(order):
+            trial=spec['trials'][t]
+            rng=np.random.default_rng(np.random.SeedSequence(entropy,spawn_key=(1,block,t,n)))
+            k=int(rng.integers(len(walks)))
+            walk=walks[k]
+            params=dict(trial.get('params') or {})
+            resampling=params.get('resample',False)
+            rate=_capture_rate(walk,resampling) if resampling else fps
+            if rate is None:
+                raise ValueError('the capture rate of '+str(walk)+' is unknown: pass it as '
+                                 +"the 'resample' parameter of the trials")
+            window=int(round(trial['seconds']*rate))
+            first=int(round(spec['skip']*rate))
+            if length(walk)-window<=first:
+                raise ValueError('walk '+str(walk)+' is too short for '+str(trial['seconds'])
+                                 +' s trials')
+            start=int(rng.integers(first,length(walk)-window))
+            kwargs=dict(params,filename_in=walk,framerange=[start,start+window],fps=fps)
+            if trial['function']=='scrambled_video':
+                kwargs['seed']=int(rng.integers(2**32))
+            #(frames of the clip, as read or resampled)
+            frames=_resampled_count(window,rate,fps) if resampling else window
+            add('trial',trial['function'],kwargs,frames,name=trial.get('name'),block=block,
+                trial=number,source=source(k),walk=k,
+                window=[start,start+window])
+            add_clip('rest',spec['rest'],block=block,trial=number)
+        add_clip('block_rest',spec['block_rest'],block=block)
+    return {'seed':entropy,'fps':fps,'jobs':jobs,'segments':segments}
+
+def build_sequence(spec,walks,filename_out,build_dir,processes=None,encoder=None,
+                   prune=True,events=None,tracer=None):
+    '''Builds the video sequence of an experiment from its
+    specification (see vicon.plan_sequence), rendering
+    only the clips that are not already in the build
+    folder.
+
+    The clips are kept in build_dir under their keys, with
+    a manifest (manifest.json) of the clips and of the last
+    sequence built. When the build is run again after a
+    change of the specification, only the clips whose
+    parameters or input changed are rendered, and the
+    sequence is joined again (without re-encoding) only if
+    its segments changed. The timing of the segments is
+    saved in an event table (see vicon.sequence_events).
+
+    Parameters
+    ----------
+    spec: dict,
+        Specification of the experiment (see
+        vicon.plan_sequence). Give a seed to rebuild the
+        same sequence
+    walks: list of str, vicon.Trajectory,
+        Preprocessed trajectory files, or Trajectory objects
+    filename_out: str,
+        Path and name of the video sequence, path of a named
+        pipe or 'pipe:1' (see vicon.assemble)
+    build_dir: str,
+        Folder of the rendered clips and the manifest
+        (created if needed)
+    processes: int, None, optional
+        Number of worker processes rendering the clips (see
+        vicon.create_video_sequence). (default=None)
+    encoder: dict, None, optional
+        Video encoding options of the clips (see
+        vicon.segment_encoder). (default=None)
+    prune: bool, optional
+        If True, the clips of previous builds that are not
+        in this sequence are removed. (default=True)
+    events: str, None, optional
+        Path and name of the event table (CSV). If None, it
+        is saved next to the sequence, named after it with
+        '_events.csv' (in build_dir if the sequence is
+        written to a pipe). (default=None)
+    tracer: vicon.Tracer, None, optional
+        Collects the time spent in each stage (see
+        vicon.Tracer). (default=None)
+
+    Returns
+    -------
+    summary: dict,
+        'plan': the plan of the sequence (see
+            vicon.plan_sequence)
+        'rendered', 'reused', 'removed': number of clips
+        'joined': True if the sequence was joined
+        'events': path of the event table
+
+    See Also
+    --------
+    plan_sequence: compiles the specification
+    sequence_events: timing of the segments of the sequence
+    create_video_sequence: creates the video sequence of the
+        standard experiment
+
+    Example
+    -------
+    spec=dict(vicon.SEQUENCE_SPEC,seed=7)
+    vicon.build_sequence(spec,['walk1.traj','walk2.traj'],'sequence.mp4','build')
+    spec['rest']=dict(spec['rest'],seconds=4) #only the rest clip is rendered again
+    vicon.build_sequence(spec,['walk1.traj','walk2.traj'],'sequence.mp4','build')
+    '''
+    import os
+    import json
+    from .cache import ClipCache
+    from .tracing import _get_tracer,_map_jobs
+    from .assemble import assemble,_is_pipe
+    from .create_video_sequence import _render_clip
+
+    plan=plan_sequence(spec,walks,encoder)
+    jobs=plan['jobs']
+    clips=ClipCache(build_dir)
+    manifest=os.path.join(clips.directory,'manifest.json')
+    records={'clips':{},'sequence':None}
+    if os.path.exists(manifest):
+        with open(manifest) as f:
+            records=json.load(f)
+    todo=[key for key in jobs
+          if key not in records['clips'] or not os.path.exists(clips.path(key))]
+
+    #rendering the clips that changed (to a partial file, renamed
+    #when finished, so an interrupted build is not taken as done)
+    work=[(jobs[key][0],dict(jobs[key][1],filename_out=clips.path(key,'.part.mp4')),None,None,
+           tracer is not None) for key in todo]
+    tracer=_get_tracer(tracer)
+    results=_map_jobs(_render_clip,work,processes,tracer)
+    try:
+        for key,_ in zip(todo,results):
+            os.replace(clips.path(key,'.part.mp4'),clips.path(key))
+            function,kwargs=jobs[key]
+            source=kwargs.get('filename_in')
+            records['clips'][key]={'function':function,'source':_source_name(source),
+                                   'params':{k:v for k,v in kwargs.items()
+                                             if k not in ('filename_in','filename_out')}}
+    finally:
+        results.close()
+        with open(manifest,'w') as f:
+            json.dump(records,f,indent=1,default=str)
+
+    #removing the clips of previous builds
+    removed=0
+    if prune:
+        for key in list(records['clips']):
+            if key not in jobs:
+                if os.path.exists(clips.path(key)):
+                    os.remove(clips.path(key))
+                del records['clips'][key]
+                removed+=1
+
+    #joining the clips, if the sequence changed
+    pipe=_is_pipe(filename_out)
+    sequence={'output':str(filename_out) if pipe else os.path.abspath(filename_out),
+              'segments':[segment['key'] for segment in plan['segments']]}
+    joined=(pipe or bool(todo) or records['sequence']!=sequence
+            or not os.path.exists(filename_out))
+    if joined:
+        records['sequence']=None
+        assemble([clips.path(key) for key in sequence['segments']],filename_out,tracer)
+        records['sequence']=sequence
+    with open(manifest,'w') as f:
+        json.dump(records,f,indent=1,default=str)
+
+    if events is None:
+        events=_events_path(filename_out,clips.directory)
+    save_events(sequence_events(plan),events)
+    return {'plan':plan,'rendered':len(todo),'reused':len(jobs)-len(todo),'removed':removed,
+            'joined':joined,'events':events}
+
+#columns of the event table
+_event_columns=('segment','kind','name','block','trial','onset_frame','onset_seconds','frames',
+                'seconds','detector','source','walk','window_start','window_end','seed')
+
+def sequence_events(plan):
+    '''Timing of the segments of a video sequence, computed
+    from its plan (no video is decoded): the frame and time
+    at which each stimulus and rest starts in the sequence,
+    with the brightness of its detector corner, for the
+    synchronization of recordings (e.g. EEG) with the
+    stimuli.
+
+    The intro (vicon.gen_detector_intro) has one event per
+    brightness level of the detector calibration. Clips
+    rendered on their own (vicon.make_video,
+    vicon.scrambled_video, vicon.central_dot and
+    vicon.gen_detector_intro) save the same events with
+    their events argument.
+
+    Parameters
+    ----------
+    plan: dict,
+        Plan of the sequence (see vicon.plan_sequence)
+
+    Returns
+    -------
+    events: list of dict,
+        In order of onset, with the keys:
+            'segment': index of the segment in the sequence
+            'kind': 'intro', 'trial', 'rest' or 'block_rest'
+            'name': trial type (None for the other kinds)
+            'block', 'trial': block and trial numbers
+            'onset_frame', 'onset_seconds': start of the event
+                in the sequence
+            'frames', 'seconds': duration of the event
+            'detector': brightness of the detector corner (0-1),
+                None if it is not drawn
+            'source': walk file of the trial ('sha256:' and the
+                digest of its contents for a vicon.Trajectory)
+            'walk': index of the walk in the walks of the plan
+            'window_start', 'window_end': frames of the walk
+                (window_end excluded)
+            'seed': scrambling seed
+
+    See Also
+    --------
+    save_events: saves the events in a CSV file
+    build_sequence: builds the sequence (and saves its events)
+
+    Example
+    -------
+    plan=vicon.plan_sequence(dict(vicon.SEQUENCE_SPEC,seed=7),['walk1.traj','walk2.traj'])
+    onsets=[e['onset_seconds'] for e in vicon.sequence_events(plan) if e['kind']=='trial']
+    '''
+    fps=plan['fps']
+    events=[]
+    onset=0
+    for k,segment in enumerate(plan['segments']):
+        events+=_segment_events(k,segment,fps,onset)
+        onset+=segment['frames']
+    return events
+
+def _segment_events(k,segment,fps,onset=0):
+    #events of a segment starting at frame onset: one per run of
+    #frames with the same detector level
+    from .gen_detector_intro import _detector_levels
+
+    window=segment.get('window') or (None,None)
+    event={'segment':k,'kind':segment['kind'],'name':segment.get('name'),
+           'block':segment.get('block'),'trial':segment.get('trial'),
+           'detector':segment.get('detector'),'source':segment.get('source'),
+           'walk':segment.get('walk'),'window_start':window[0],'window_end':window[1],
+           'seed':segment.get('seed')}
+    if segment['function']=='gen_detector_intro':
+        levels=_detector_levels(segment['frames'],fps)
+    else:
+        levels=[event['detector']]*segment['frames']
+    events=[]
+    start=0
+    for i in range(1,len(levels)+1):
+        if i==len(levels) or levels[i]!=levels[start]:
+            events.append(dict(event,onset_frame=onset+start,onset_seconds=(onset+start)/fps,
+                               frames=i-start,seconds=(i-start)/fps,detector=levels[start]))
+            start=i
+    return events
+
+def _save_clip_events(filename,kind,function,frames,fps,**info):
+    #saves the events of a clip rendered on its own (see the events
+    #argument of the renderers), with onsets from the start of the clip
+    segment={'kind':kind,'function':function,'frames':frames}
+    segment.update(info)
+    save_events(_segment_events(0,segment,fps),filename)
+
+def _source_name(source):
+    #name of an input in the events: the file, or the digest of the
+    #contents of a Trajectory (its repr does not identify it)
+    from .trajectory import Trajectory
+    from .cache import _input_digest
+
+    if source is None:
+        return None
+    if isinstance(source,Trajectory):
+        return 'sha256:'+_input_digest(source)
+    return str(source)
+
+def save_events(events,filename):
+    '''Saves the events of a sequence (see
+    vicon.sequence_events) in a CSV file, with a header
+    row. Missing values are empty.'''
+    import csv
+
+    with open(filename,'w',newline='') as f:
+        writer=csv.DictWriter(f,_event_columns,extrasaction='ignore')
+        writer.writeheader()
+        for event in events:
+            writer.writerow({key:'' if event.get(key) is None else event[key]
+                             for key in _event_columns})
+
+def _events_path(filename_out,folder):
+    #event table next to the sequence (or in folder, for pipes)
+    import os
+    from .assemble import _is_pipe
+
+    if _is_pipe(filename_out):
+        return os.path.join(folder,'events.csv')
+    return os.path.splitext(str(filename_out))[0]+'_events.csv'
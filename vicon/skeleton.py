@@ -0,0 +1,49 @@
+#links between point-light displays, forming arms, legs, head etc
+_HUMANOID=((0,1),(0,2),(0,4),(1,2),(1,3),(4,5),(4,10),(5,6),(5,18),(6,7),(6,14),(7,8),
+           (8,9),(10,11),(10,14),(11,12),(12,13),(14,15),(15,16),(16,17),(18,19),(19,5))
+
+def skeleton_edges(links='original',nmarkers=20):
+    '''Validated array of the pairs of markers linked
+    by a stick, built once and used by the renderers to
+    gather the stick segments of all frames at once.
+
+    Parameters
+    ----------
+    links: 2D list, 2D tuple, numpy array (E x 2), None, 'original', optional
+        The pairs showing which VICON points should be
+        linked with a line. If 'original', the humanoid
+        skeleton; if None, no links. (default='original')
+    nmarkers: int, optional
+        Number of markers. Pairs with markers that do not
+        exist are dropped. (default=20)
+
+    Returns
+    -------
+    edges: numpy array (E x 2), int
+        Marker indices of the ends of each stick, without
+        repeated pairs
+
+    Example
+    -------
+    edges=vicon.skeleton_edges('original')
+    segments=points[:,edges,:2] #frames x E x 2 ends x 2
+    '''
+    import numpy as np
+
+    if links is None:
+        return np.zeros((0,2),dtype=int)
+    if type(links)==str:
+        if links!='original':
+            raise ValueError("links must be a list of pairs, None or 'original'")
+        links=_HUMANOID
+    edges=np.asarray(links)
+    if edges.size==0:
+        return np.zeros((0,2),dtype=int)
+    if edges.ndim!=2 or edges.shape[1]!=2 or not np.issubdtype(edges.dtype,np.integer):
+        raise ValueError('links must be pairs of marker indices')
+    edges=edges.astype(int)
+    valid=(edges>=0).all(axis=1)&(edges<nmarkers).all(axis=1)&(edges[:,0]!=edges[:,1])
+    edges=edges[valid]
+    #the same pair (in any order) is drawn only once
+    _,first=np.unique(np.sort(edges,axis=1),axis=0,return_index=True)
+    return edges[np.sort(first)]
@@ -0,0 +1,217 @@
+class Tracer:
+    '''Collects the time spent in each stage of the
+    processing pipeline (read, filter, resample, center,
+    scramble, project, draw, encode, concat, ...), for the
+    entry points that accept a tracer argument (e.g.
+    vicon.preprocess, vicon.make_video).
+
+    Each stage is reported to a callback or, if there is
+    no callback, to the 'vicon' logger (INFO level).
+    Optionally, the traced calls are also profiled with
+    cProfile and their memory is measured with tracemalloc.
+
+    Parameters
+    ----------
+    callback: function, None, optional
+        Called after each stage with a dict with the keys
+        'stage', 'frames' (frames processed, or None),
+        'seconds' and 'peak_memory' (bytes, or None).
+        (default=None)
+    profile: bool, optional
+        If True, the traced calls are profiled with
+        cProfile (see Tracer.stats). (default=False)
+    memory: bool, optional
+        If True, the peak memory of each stage is measured
+        with tracemalloc, which slows down the processing.
+        (default=False)
+
+    Example
+    -------
+    tracer=vicon.Tracer(profile=True)
+    vicon.make_video('pre_processed.traj','video.mp4',framerange=[500,1400],tracer=tracer)
+    print(tracer.summary())
+    tracer.stats().sort_stats('cumulative').print_stats(20)
+    '''
+    def __init__(self,callback=None,profile=False,memory=False):
+        import cProfile
+
+        self.callback=callback
+        self.memory=memory
+        self.records=[]
+        self._profiler=cProfile.Profile() if profile else None
+        self._depth=0
+        self._tracing_memory=False
+
+    def stage(self,name,frames=None):
+        '''Context manager timing a stage. The frames can
+        also be set afterwards, in the yielded record.
+
+        Example
+        -------
+        with tracer.stage('read') as record:
+            xyz=...
+            record['frames']=len(xyz)
+        '''
+        return _Stage(self,name,frames)
+
+    def record(self,name,seconds,frames=None,peak_memory=None):
+        '''Records a stage timed by the caller'''
+        import logging
+
+        record={'stage':name,'frames':frames,'seconds':seconds,'peak_memory':peak_memory}
+        self.records.append(record)
+        if self.callback is not None:
+            self.callback(record)
+        else:
+            logging.getLogger('vicon').info('%s: %s frames in %.3f s',name,frames,seconds)
+        return record
+
+    def capture(self):
+        '''Context manager enabling the profiler (and the
+        memory tracing) without recording a stage'''
+        return _Capture(self)
+
+    def summary(self):
+        '''Totals of each stage: dict of stage names to
+        dicts with 'calls', 'frames', 'seconds', 'fps' and
+        'peak_memory' '''
+        totals={}
+        for record in self.records:
+            total=totals.setdefault(record['stage'],{'calls':0,'frames':0,'seconds':0.0,
+                                                     'fps':None,'peak_memory':None})
+            total['calls']+=1
+            total['frames']+=record['frames'] or 0
+            total['seconds']+=record['seconds']
+            if record['peak_memory'] is not None:
+                total['peak_memory']=max(total['peak_memory'] or 0,record['peak_memory'])
+        for total in totals.values():
+            if total['frames'] and total['seconds']>0:
+                total['fps']=total['frames']/total['seconds']
+        return totals
+
+    def stats(self):
+        '''cProfile statistics of the traced calls
+        (pstats.Stats), or None if not profiling'''
+        import pstats
+
+        if self._profiler is None or self._profiler.getstats()==[]:
+            return None
+        return pstats.Stats(self._profiler)
+
+    def _enter(self):
+        import tracemalloc
+
+        self._depth+=1
+        if self._depth>1:
+            return
+        if self._profiler is not None:
+            self._profiler.enable()
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing_memory=True
+
+    def _exit(self):
+        import tracemalloc
+
+        self._depth-=1
+        if self._depth>0:
+            return
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self._tracing_memory:
+            tracemalloc.stop()
+            self._tracing_memory=False
+
+class _Stage:
+    def __init__(self,tracer,name,frames):
+        self.tracer=tracer
+        self.values={'frames':frames}
+        self.name=name
+
+    def __enter__(self):
+        import time
+        import tracemalloc
+
+        self.tracer._enter()
+        if self.tracer.memory:
+            self.start_memory=tracemalloc.get_traced_memory()[0]
+            if hasattr(tracemalloc,'reset_peak'):
+                tracemalloc.reset_peak()
+        self.start=time.perf_counter()
+        return self.values
+
+    def __exit__(self,*args):
+        import time
+        import tracemalloc
+
+        seconds=time.perf_counter()-self.start
+        peak=None
+        if self.tracer.memory:
+            peak=max(tracemalloc.get_traced_memory()[1]-self.start_memory,0)
+        self.tracer._exit()
+        if args[0] is None:
+            self.tracer.record(self.name,seconds,self.values['frames'],peak)
+
+class _Capture:
+    def __init__(self,tracer):
+        self.tracer=tracer
+
+    def __enter__(self):
+        self.tracer._enter()
+        return self.tracer
+
+    def __exit__(self,*args):
+        self.tracer._exit()
+
+class _NullTracer:
+    #tracer used when the caller does not trace (does nothing)
+    memory=False
+
+    def stage(self,name,frames=None):
+        return _NullContext()
+
+    def record(self,name,seconds,frames=None,peak_memory=None):
+        pass
+
+    def capture(self):
+        return _NullContext()
+
+class _NullContext:
+    def __enter__(self):
+        return {'frames':None}
+
+    def __exit__(self,*args):
+        pass
+
+def _get_tracer(tracer):
+    #the tracer of an entry point (a no-op one if None)
+    return _NullTracer() if tracer is None else tracer
+
+def _map_jobs(function,jobs,processes=None,tracer=None):
+    #runs function on each job in worker processes (or one after another
+    #if processes=1), yielding the results in order; each result is the
+    #list of the records of the stages timed by the worker, which are
+    #added to the tracer. If a job fails (or the caller stops), the jobs
+    #still queued are cancelled, so the error is not delayed by them
+    from concurrent.futures import ProcessPoolExecutor
+
+    tracer=_get_tracer(tracer)
+    jobs=list(jobs)
+    pool=None
+    if processes==1 or len(jobs)<=1:
+        results=map(function,jobs)
+    else:
+        pool=ProcessPoolExecutor(max_workers=processes)
+        futures=[pool.submit(function,job) for job in jobs]
+        results=(future.result() for future in futures)
+    try:
+        for records in results:
+            for record in records:
+                tracer.record(record['stage'],record['seconds'],record['frames'],
+                              record['peak_memory'])
+            yield records
+    finally:
+        if pool is not None:
+            for future in futures:
+                future.cancel()
+            pool.shutdown()
@@ -0,0 +1,157 @@
+class Trajectory:
+    '''Marker trajectories of an acquisition, stored in a
+    single contiguous float32 array (frames x markers x
+    3), with the marker names and the capture rate.
+
+    Windows of frames and ranges of markers are views on
+    the same array (no copy), and a Trajectory can be
+    used wherever a numpy array of trajectories is
+    expected (np.asarray(trajectory) is its array). It is
+    accepted as input by vicon.preprocess, vicon.make_video,
+    vicon.scrambled_video and vicon.create_video_sequence.
+
+    Parameters
+    ----------
+    xyz: numpy array (frames x markers x 3),
+        Marker trajectories, in x,y,z coordinates. float32
+        C-contiguous arrays (e.g. memory-mapped binary
+        trajectory files) are used without a copy
+    rate: float, None, optional
+        Capture rate, in Hz. (default=None)
+    markers: list of str, None, optional
+        Marker names. (default=None)
+
+    Example
+    -------
+    walk=vicon.Trajectory.load('pre_processed.traj')
+    clip=walk.seconds(4,34)
+    vicon.make_video(clip,'walk.mp4',resample=True)
+    arms=walk.select(slice(0,10))
+    '''
+    def __init__(self,xyz,rate=None,markers=None):
+        import numpy as np
+
+        xyz=np.asarray(xyz)
+        if xyz.ndim!=3 or xyz.shape[2]!=3:
+            raise ValueError('expected an array of shape (frames,markers,3)')
+        if markers is not None and len(markers)!=xyz.shape[1]:
+            raise ValueError('expected '+str(xyz.shape[1])+' marker names')
+        if xyz.dtype!=np.float32 or not xyz.flags.c_contiguous:
+            xyz=np.ascontiguousarray(xyz,dtype=np.float32)
+        self.xyz=xyz
+        self.rate=None if rate is None else float(rate)
+        self.markers=None if markers is None else list(markers)
+
+    @classmethod
+    def load(cls,filename,framerange=None):
+        '''Reads a preprocessed CSV or binary trajectory
+        file (see vicon.read_frames). Binary files are
+        memory-mapped, and not read until used.'''
+        from .trajectory_file import read_frames
+
+        xyz,header=read_frames(filename,framerange)
+        return cls(xyz,header['rate'],header['markers'])
+
+    def save(self,filename):
+        '''Saves a binary trajectory file (see
+        vicon.save_trajectory)'''
+        from .trajectory_file import save_trajectory
+
+        save_trajectory(filename,self.xyz,self.rate,self.markers)
+
+    @property
+    def numframes(self):
+        return self.xyz.shape[0]
+
+    @property
+    def nmarkers(self):
+        return self.xyz.shape[1]
+
+    @property
+    def duration(self):
+        '''Duration, in seconds (None if the rate is unknown)'''
+        return None if self.rate is None else self.numframes/self.rate
+
+    def window(self,start=0,end=None):
+        '''Frames from start to end (excluded), as a view'''
+        return Trajectory._view(self.xyz[start:end],self.rate,self.markers)
+
+    def seconds(self,start=0,end=None):
+        '''Frames from start to end (excluded) seconds, as
+        a view'''
+        if self.rate is None:
+            raise ValueError('the capture rate is unknown')
+        return self.window(int(round(start*self.rate)),
+                           None if end is None else int(round(end*self.rate)))
+
+    def select(self,markers):
+        '''Subset of markers: a view if markers is a slice,
+        a copy if it is a list of marker indices or names'''
+        if isinstance(markers,slice):
+            names=None if self.markers is None else self.markers[markers]
+            return Trajectory._view(self.xyz[:,markers],self.rate,names)
+        index=[self.markers.index(m) if isinstance(m,str) else m for m in markers]
+        names=None if self.markers is None else [self.markers[k] for k in index]
+        return Trajectory(self.xyz[:,index],self.rate,names)
+
+    def resample(self,fps,method='linear'):
+        '''Trajectory resampled to fps (see vicon.resample)'''
+        from .resample import resample
+
+        if self.rate is None:
+            raise ValueError('the capture rate is unknown')
+        return Trajectory(resample(self.xyz,self.rate,fps,method),fps,self.markers)
+
+    def __len__(self):
+        return self.numframes
+
+    def __array__(self,dtype=None,copy=None):
+        import numpy as np
+
+        if dtype is None or np.dtype(dtype)==self.xyz.dtype:
+            return self.xyz.copy() if copy else self.xyz
+        return self.xyz.astype(dtype)
+
+    def __repr__(self):
+        return ('Trajectory('+str(self.numframes)+' frames, '+str(self.nmarkers)
+                +' markers, rate='+str(self.rate)+')')
+
+    @classmethod
+    def _view(cls,xyz,rate,markers):
+        #trajectory on a view of an array, which may not be
+        #C-contiguous (e.g. a range of markers), without copying
+        trajectory=cls.__new__(cls)
+        trajectory.xyz=xyz
+        trajectory.rate=rate
+        trajectory.markers=markers
+        return trajectory
+
+class _TrajectoryBuffer:
+    #collects the chunks of a Trajectory in memory (with the methods
+    #of vicon.TrajectoryWriter)
+    def __init__(self,nmarkers=20,rate=None,markers=None):
+        self.nmarkers=nmarkers
+        self.rate=rate
+        self.markers=markers
+        self.chunks=[]
+
+    def append(self,xyz):
+        import numpy as np
+
+        self.chunks.append(np.asarray(xyz,dtype=np.float32))
+
+    def close(self):
+        pass
+
+    def trajectory(self):
+        import numpy as np
+
+        xyz=np.concatenate(self.chunks) if self.chunks else np.zeros((0,self.nmarkers,3))
+        self.chunks=[]
+        return Trajectory(xyz,self.rate,self.markers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.close()
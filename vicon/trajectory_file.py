@@ -0,0 +1,262 @@
+#binary trajectory file layout:
+#   8 bytes     magic string
+#   4 bytes     header length (uint32, little endian)
+#   n bytes     JSON header (space padded), with the keys
+#               'version','dtype','shape','rate','markers'
+#   remaining   float32 data (frames x markers x 3), C order,
+#               starting at a 64-byte aligned offset
+_MAGIC=b'VICONTRJ'
+
+def is_trajectory_file(filename):
+    '''Checks whether a file is a binary trajectory
+    file (see vicon.save_trajectory), instead of a
+    preprocessed CSV file.
+
+    Parameters
+    ----------
+    filename: str,
+        Path and name of the file
+
+    Returns
+    -------
+    bool
+    '''
+    try:
+        with open(filename,'rb') as f:
+            return f.read(len(_MAGIC))==_MAGIC
+    except OSError:
+        return False
+
+def _read_header(f):
+    import json
+    import struct
+
+    if f.read(len(_MAGIC))!=_MAGIC:
+        raise ValueError('not a binary trajectory file: '+str(f.name))
+    size,=struct.unpack('<I',f.read(4))
+    header=json.loads(f.read(size).decode('utf-8'))
+    header['offset']=len(_MAGIC)+4+size
+    return header
+
+def _encode_header(header,size=None):
+    import json
+    import struct
+
+    text=json.dumps(header).encode('utf-8')
+    if size is None:
+        #room for the frame count to grow while appending,
+        #with the data starting at a 64-byte aligned offset
+        size=len(text)+32
+        size+=(-(len(_MAGIC)+4+size))%64
+    if len(text)>size:
+        raise ValueError('trajectory header too long')
+    return _MAGIC+struct.pack('<I',size)+text+b' '*(size-len(text))
+
+class TrajectoryWriter:
+    '''Writes a binary trajectory file incrementally,
+    one chunk of frames at a time.
+
+    Parameters
+    ----------
+    filename: str,
+        Path and name of the binary trajectory file to
+        be created
+    nmarkers: int, optional
+        Number of markers. (default=20)
+    rate: float, None, optional
+        Capture rate of the acquisition, in Hz
+    markers: list of str, None, optional
+        Marker names
+
+    Example
+    -------
+    with vicon.TrajectoryWriter('walk.traj',rate=120) as w:
+        for xyz in chunks:
+            w.append(xyz)
+    '''
+    def __init__(self,filename,nmarkers=20,rate=None,markers=None):
+        self.filename=filename
+        self.numframes=0
+        self.header={'version':1,'dtype':'<f4','shape':[0,nmarkers,3],
+                     'rate':rate,'markers':markers}
+        self._f=open(filename,'wb')
+        data=_encode_header(self.header)
+        self._size=len(data)-len(_MAGIC)-4
+        self._f.write(data)
+
+    def append(self,xyz):
+        '''Appends frames (frames x markers x 3) to the file'''
+        import numpy as np
+
+        xyz=np.ascontiguousarray(xyz,dtype='<f4')
+        if xyz.ndim!=3 or xyz.shape[1:]!=tuple(self.header['shape'][1:]):
+            raise ValueError('expected an array of shape (frames,'
+                             +str(self.header['shape'][1])+',3)')
+        self._f.write(xyz.tobytes())
+        self.numframes+=xyz.shape[0]
+
+    def close(self):
+        '''Writes the final frame count and closes the file'''
+        if self._f.closed:
+            return
+        self.header['shape'][0]=self.numframes
+        self._f.seek(0)
+        self._f.write(_encode_header(self.header,self._size))
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.close()
+
+def save_trajectory(filename,xyz,rate=None,markers=None):
+    '''Saves marker trajectories as a binary trajectory
+    file, which can be memory-mapped for reading.
+
+    Parameters
+    ----------
+    filename: str,
+        Path and name of the binary trajectory file to
+        be created
+    xyz: numpy array (frames x markers x 3),
+        Marker trajectories, in x,y,z coordinates
+    rate: float, None, optional
+        Capture rate of the acquisition, in Hz
+    markers: list of str, None, optional
+        Marker names
+
+    Returns
+    -------
+    (none) (output file is saved in the specified filename)
+
+    See Also
+    --------
+    load_trajectory: memory-maps a binary trajectory file
+    '''
+    with TrajectoryWriter(filename,nmarkers=xyz.shape[1],rate=rate,markers=markers) as w:
+        w.append(xyz)
+
+def load_trajectory(filename,mode='r'):
+    '''Memory-maps a binary trajectory file, without
+    reading or copying the data.
+
+    Parameters
+    ----------
+    filename: str,
+        Path and name of the binary trajectory file
+    mode: str, optional
+        Memory-map mode ('r' for read-only, 'r+' for
+        read-write). (default='r')
+
+    Returns
+    -------
+    xyz: numpy memmap (frames x markers x 3), float32
+        Marker trajectories, in x,y,z coordinates
+    header: dict,
+        'rate' (capture rate, in Hz, or None), 'markers'
+        (marker names, or None) and 'numframes'
+
+    See Also
+    --------
+    save_trajectory: saves a binary trajectory file
+    count_frames: number of frames of a trajectory file
+    '''
+    import numpy as np
+
+    with open(filename,'rb') as f:
+        header=_read_header(f)
+    shape=tuple(header['shape'])
+    if shape[0]==0:
+        xyz=np.zeros(shape,dtype=header['dtype'])
+    else:
+        xyz=np.memmap(filename,dtype=header['dtype'],mode=mode,
+                      offset=header['offset'],shape=shape)
+    return xyz,{'rate':header['rate'],'markers':header['markers'],'numframes':shape[0]}
+
+def count_frames(filename):
+    '''Number of frames of a preprocessed trajectory
+    file. For binary trajectory files, it is read from
+    the header, without reading the data.
+
+    Parameters
+    ----------
+    filename: str,
+        Path and name of the preprocessed CSV or binary
+        trajectory file
+
+    Returns
+    -------
+    numframes: int
+    '''
+    from .frame_index import frame_index
+
+    if is_trajectory_file(filename):
+        with open(filename,'rb') as f:
+            return _read_header(f)['shape'][0]
+    return len(frame_index(filename))-1
+
+def read_frames(filename,framerange=None):
+    '''Reads a range of frames of a preprocessed
+    trajectory file, either a CSV file or a binary
+    trajectory file. Binary files are memory-mapped,
+    so the returned array is a view on the file. For
+    CSV files, only the requested lines are read and
+    parsed, using the frame index (see
+    vicon.frame_index).
+
+    Parameters
+    ----------
+    filename: str,
+        Path and name of the preprocessed CSV or binary
+        trajectory file
+    framerange: int, list (2 elements), tuple (2 elements), optional
+        If int, the number of frames to read from the
+        start. If list or tuple, the first and the end
+        (excluded) frames. If None, reads all frames.
+        (default=None)
+
+    Returns
+    -------
+    xyz: numpy array (frames x markers x 3),
+        Marker trajectories, in x,y,z coordinates
+    header: dict,
+        'rate' (capture rate, in Hz), 'markers' (marker
+        names) and 'numframes' (of the whole file). The
+        rate and marker names are None for CSV files
+    '''
+    import io
+    import numpy as np
+    import pandas as pd
+    from .frame_index import frame_index
+
+    if type(framerange)==int:
+        start,end=0,framerange
+    elif type(framerange)==list or type(framerange)==tuple:
+        start,end=framerange[0],framerange[1]
+    else:
+        start,end=0,None
+
+    if is_trajectory_file(filename):
+        xyz,header=load_trajectory(filename)
+        return xyz[start:end],header
+
+    offsets=frame_index(filename)
+    numframes=len(offsets)-1
+    if end is None or end>numframes:
+        end=numframes
+    start=min(start,end)
+    with open(filename,'rb') as f:
+        columns=f.readline().decode('utf-8').strip().split(',')
+        f.seek(offsets[start])
+        block=f.read(offsets[end]-offsets[start])
+    nmarkers=len([c for c in columns if c.split('.')[0]=='X'])
+    suffixes=['']+['.'+str(k) for k in range(1,nmarkers)]
+    names=[axis+k for axis in ('X','Y','Z') for k in suffixes]
+    if end>start:
+        data=pd.read_csv(io.BytesIO(block),header=None,names=columns)
+        values=data[names].to_numpy(dtype=float)
+    else:
+        values=np.zeros((0,3*nmarkers))
+    xyz=np.ascontiguousarray(values.reshape(len(values),3,nmarkers).transpose(0,2,1))
+    return xyz,{'rate':None,'markers':None,'numframes':numframes}